@@ -0,0 +1,122 @@
+# bench_compact_forest.py
+#
+# Size, load time, batch throughput and prediction agreement of the compact
+# random forest export (pipeline/compact_forest.py) against the joblib
+# pickle it is built from. Trains a forest on a seeded synthetic set unless
+# a fitted model and a feature file are given.
+#
+#   python benchmarks/bench_compact_forest.py --rows 200000
+#   python benchmarks/bench_compact_forest.py --model random_forest_risk_classifier_final.pkl \
+#       --input phase5_processed_funds_data_final.csv
+
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pipeline.compact_forest import CompactForest, export_forest, forest_size  # noqa: E402
+from pipeline.risk_model import RISK_FEATURES  # noqa: E402
+from pipeline.snapshot import read_table  # noqa: E402
+
+
+def make_fixture(n_rows, seed):
+    """Noisy three-class problem over the set 5 features, with a few missing values."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, len(RISK_FEATURES))), columns=RISK_FEATURES)
+    score = X.iloc[:, 2] + X.iloc[:, 3] - X.iloc[:, 4] + rng.normal(0, 0.5, n_rows)
+    y = np.digitize(score, np.quantile(score, [1 / 3, 2 / 3]))
+    return X, y
+
+
+def leaf_root_diff(seed):
+    """
+    Max |proba diff| on a shallow forest over a tiny, imbalanced set, where
+    some bootstrap samples hold one class only and their tree is a single leaf.
+    """
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(50, len(RISK_FEATURES))), columns=RISK_FEATURES)
+    y = np.zeros(50, dtype=int)
+    y[:2] = 1
+    model = RandomForestClassifier(n_estimators=30, max_depth=3, random_state=seed).fit(X, y)
+    n_leaf_roots = sum(estimator.tree_.node_count == 1 for estimator in model.estimators_)
+
+    compact = CompactForest.load(export_forest(model, tempfile.mkdtemp(prefix="compact_forest_leaf_")))
+    X_test = pd.DataFrame(rng.normal(size=(500, len(RISK_FEATURES))), columns=RISK_FEATURES)
+    X_test.iloc[::7, 1] = np.nan
+    diff = np.abs(model.predict_proba(X_test) - compact.predict_proba(X_test.to_numpy())).max()
+    return n_leaf_roots, diff
+
+
+def best_of(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compact forest with the pickled model.")
+    parser.add_argument("--model", help="Fitted forest pickle; a forest is trained if omitted")
+    parser.add_argument("--input", help="Feature file to predict on (set 5 feature columns)")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="compact_forest_")
+    if args.model:
+        model_path = args.model
+        model = joblib.load(model_path)
+    else:
+        X_train, y_train = make_fixture(args.rows, args.seed)
+        model = RandomForestClassifier(n_estimators=args.trees, random_state=args.seed, n_jobs=-1)
+        model.fit(X_train, y_train)
+        model_path = os.path.join(work_dir, "forest.pkl")
+        joblib.dump(model, model_path)
+
+    if args.input:
+        X = read_table(args.input, columns=RISK_FEATURES).dropna()
+    else:
+        X, _ = make_fixture(max(args.batch, 50_000), args.seed + 1)
+        X.iloc[::97, 0] = np.nan
+    X = X[list(getattr(model, "feature_names_in_", RISK_FEATURES))]
+    batch = X.iloc[:args.batch]
+
+    compact_path = export_forest(model, os.path.join(work_dir, "forest_compact"))
+
+    _, pickle_load_s = best_of(lambda: joblib.load(model_path), args.repeat)
+    compact, compact_load_s = best_of(lambda: CompactForest.load(compact_path), args.repeat)
+
+    expected, pickle_s = best_of(lambda: model.predict(batch), args.repeat)
+    actual, compact_s = best_of(lambda: compact.predict(batch.to_numpy()), args.repeat)
+    agreement = (model.predict(X) == compact.predict(X.to_numpy())).mean()
+    proba_diff = np.abs(model.predict_proba(batch) - compact.predict_proba(batch.to_numpy())).max()
+
+    pickle_size, compact_size = forest_size(model_path), forest_size(compact_path)
+    print(f"trees: {compact.n_trees}, nodes: {compact.meta['n_nodes']}, batch: {len(batch)} rows")
+    print(f"{'':<22}{'pickle':>12}{'compact':>12}")
+    print(f"{'size (MB)':<22}{pickle_size / 1e6:>12.1f}{compact_size / 1e6:>12.1f}")
+    print(f"{'load (ms)':<22}{pickle_load_s * 1e3:>12.1f}{compact_load_s * 1e3:>12.1f}")
+    print(f"{'batch predict (ms)':<22}{pickle_s * 1e3:>12.1f}{compact_s * 1e3:>12.1f}")
+    print(f"{'throughput (rows/s)':<22}{len(batch) / pickle_s:>12.0f}{len(batch) / compact_s:>12.0f}")
+    print(f"agreement on {len(X)} rows: {agreement:.4%}, max |proba diff| {proba_diff:.2e}")
+
+    n_leaf_roots, leaf_root_proba_diff = leaf_root_diff(args.seed)
+    print(f"single-leaf trees: {n_leaf_roots} of 30, max |proba diff| {leaf_root_proba_diff:.2e}")
+    sys.exit(0 if agreement == 1 and leaf_root_proba_diff == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# bench_nav_features.py
+#
+# Regression check and timing for the vectorized phase 2 NAV features in
+# pipeline/nav_features.py against the per-scheme loops they replace.
+# Runs on a seeded synthetic NAV history, or on a real after_phase_1 file.
+#
+#   python benchmarks/bench_nav_features.py --schemes 2000
+#   python benchmarks/bench_nav_features.py --input after_phase_1.csv
+
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pipeline import nav_features  # noqa: E402
+from pipeline.snapshot import read_table  # noqa: E402
+
+
+def make_fixture(n_schemes, years, seed):
+    """
+    Business-day NAV histories with random holidays, staggered launch dates,
+    a few missing NAVs and a few schemes that stop reporting early.
+    """
+    rng = np.random.default_rng(seed)
+    calendar = pd.bdate_range(end="2025-03-31", periods=int(years * 252))
+    calendar = calendar[rng.random(len(calendar)) > 0.03]
+
+    frames = []
+    for scheme_id in range(1, n_schemes + 1):
+        start = rng.integers(0, len(calendar) - 30)
+        end = len(calendar) if rng.random() > 0.05 else rng.integers(start + 20, len(calendar))
+        dates = calendar[start:end]
+        returns = rng.normal(0.0004, 0.01, len(dates))
+        nav = 10 * np.exp(np.cumsum(returns))
+        nav[rng.random(len(dates)) < 0.002] = np.nan
+        frames.append(pd.DataFrame({"SchemeID": scheme_id, "Date": dates, "NAV": nav}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def compare(name, expected, actual, key="SchemeID"):
+    """Compares two result frames, row-aligned by `key` (or by index when key is None)."""
+    if key is None:
+        actual = actual.loc[expected.index, expected.columns]
+    else:
+        expected = expected.sort_values(key).reset_index(drop=True)
+        actual = actual.sort_values(key).reset_index(drop=True)[expected.columns]
+    diffs = {}
+    for col in expected.columns:
+        a = expected[col].to_numpy(dtype=float)
+        b = actual[col].to_numpy(dtype=float)
+        same = np.isclose(a, b, rtol=1e-9, atol=1e-12, equal_nan=True)
+        if not same.all():
+            diffs[col] = int((~same).sum())
+    status = "✅ match" if not diffs else f"❌ mismatches {diffs}"
+    print(f"{name:<24}{status}")
+    return not diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the vectorized NAV features.")
+    parser.add_argument("--input", help="after_phase_1 file (SchemeID, Date, NAV); synthetic if omitted")
+    parser.add_argument("--schemes", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.input:
+        df = read_table(args.input, columns=["SchemeID", "Date", "NAV"], parse_dates=["Date"])
+    else:
+        df = make_fixture(args.schemes, args.years, args.seed)
+    df = df.sort_values(["SchemeID", "Date"]).reset_index(drop=True)
+    print(f"rows: {len(df)}, schemes: {df['SchemeID'].nunique()}")
+
+    ok = True
+
+    # CAGR
+    expected, legacy_s = timed(nav_features.reference_cagr_table, df)
+    actual, fast_s = timed(nav_features.cagr_table, df, ("1Y", "2Y"))
+    ok &= compare("CAGR 1Y/2Y", expected, actual)
+    print(f"{'':<24}loop {legacy_s:.2f} s, vectorized {fast_s:.2f} s ({legacy_s / fast_s:.0f}x)")
+    _, all_s = timed(nav_features.cagr_table, df, ("3M", "6M", "1Y", "2Y", "3Y"))
+    print(f"{'':<24}5 horizons vectorized {all_s:.2f} s")
+
+    # Period returns and their per-scheme STDs
+    (expected_rows, expected_std), legacy_s = timed(nav_features.reference_period_returns, df)
+    (actual_rows, actual_std), fast_s = timed(nav_features.period_returns, df)
+    ok &= compare("period returns", expected_rows.drop(columns=list(nav_features.PERIODS)),
+                  actual_rows, key=None)
+    ok &= compare("period STDs", expected_std, actual_std)
+    print(f"{'':<24}to_period {legacy_s:.2f} s, integer keys {fast_s:.2f} s ({legacy_s / fast_s:.0f}x)")
+
+    # Rolling volatility
+    df["Daily_Return"] = df.groupby("SchemeID")["NAV"].pct_change()
+    expected, legacy_s = timed(nav_features.reference_rolling_volatility, df)
+    actual, fast_s = timed(nav_features.rolling_stats, df)
+    ok &= compare("rolling volatility", expected, actual, key=None)
+    print(f"{'':<24}lambdas {legacy_s:.2f} s, kernel {fast_s:.2f} s ({legacy_s / fast_s:.0f}x)")
+    _, all_s = timed(nav_features.rolling_stats, df, "Daily_Return",
+                     nav_features.ROLLING_WINDOWS, tuple(nav_features.ROLLING_STATS))
+    print(f"{'':<24}std + mean + downside, 3 windows {all_s:.2f} s")
+
+    # Downside deviation and max drawdown
+    expected, legacy_s = timed(nav_features.reference_downside_std, df)
+    actual, fast_s = timed(nav_features.downside_std, df)
+    ok &= compare("downside std", expected.reset_index(), actual.reset_index())
+    print(f"{'':<24}apply {legacy_s:.2f} s, vectorized {fast_s:.2f} s ({legacy_s / fast_s:.0f}x)")
+
+    expected, legacy_s = timed(nav_features.reference_max_drawdown, df)
+    actual, fast_s = timed(nav_features.drawdown_table, df)
+    ok &= compare("max drawdown", expected.rename("Max_Drawdown").reset_index(),
+                  actual[["SchemeID", "Max_Drawdown"]])
+    print(f"{'':<24}apply {legacy_s:.2f} s, vectorized with dates {fast_s:.2f} s "
+          f"({legacy_s / fast_s:.0f}x)")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
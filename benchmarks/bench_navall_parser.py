@@ -0,0 +1,94 @@
+# bench_navall_parser.py
+#
+# Compares the streaming NAVAll.txt parser against the previous
+# splitlines/split/StringIO implementation on a recorded NAVAll fixture.
+#
+#   python benchmarks/bench_navall_parser.py --record NAVAll.txt   # save a fixture
+#   python benchmarks/bench_navall_parser.py NAVAll.txt
+
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+import pandas as pd
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mf_website", "backend"))
+from nav_live_fetcher import NAVALL_URL, parse_navall  # noqa: E402
+
+
+def legacy_parse(path):
+    """The pre-streaming implementation of fetch_latest_nav(), minus the download."""
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    lines = content.splitlines()
+
+    valid_lines = []
+    for line in lines:
+        parts = line.split(';')
+        if len(parts) == 6 and not line.startswith(('Scheme Code', ';')) and line.strip():
+            valid_lines.append(line)
+
+    df = pd.read_csv(StringIO("\n".join(valid_lines)), sep=';', header=None)
+    df.columns = ["SchemeCode", "ISIN_1", "ISIN_2", "Scheme", "NAV", "Date"]
+    df.dropna(subset=["Scheme", "NAV"], inplace=True)
+    df["NAV"] = pd.to_numeric(df["NAV"], errors="coerce")
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["Scheme"] = df["Scheme"].astype(str).str.strip().str.lower()
+    return df.dropna(subset=["NAV", "Date"])
+
+
+def streaming_parse(path):
+    with open(path, "rb") as f:
+        return parse_navall(f)
+
+
+def measure(fn, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NAVAll.txt parsers.")
+    parser.add_argument("fixture", help="Path to a recorded NAVAll.txt")
+    parser.add_argument("--record", action="store_true", help="Download NAVAll.txt to FIXTURE first")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        response = requests.get(NAVALL_URL, headers={"User-Agent": "Mozilla/5.0"}, timeout=30)
+        response.raise_for_status()
+        with open(args.fixture, "wb") as f:
+            f.write(response.content)
+        print(f"✅ Recorded {len(response.content) / 1e6:.1f} MB to {args.fixture}")
+
+    legacy_t, legacy_mem, legacy_df = measure(legacy_parse, args.fixture, args.repeat)
+    stream_t, stream_mem, stream_df = measure(streaming_parse, args.fixture, args.repeat)
+
+    print(f"{'parser':<12}{'rows':>8}{'best time (ms)':>16}{'peak memory (MB)':>18}")
+    print(f"{'legacy':<12}{len(legacy_df):>8}{legacy_t * 1e3:>16.1f}{legacy_mem / 1e6:>18.1f}")
+    print(f"{'streaming':<12}{len(stream_df):>8}{stream_t * 1e3:>16.1f}{stream_mem / 1e6:>18.1f}")
+    print(f"speed-up x{legacy_t / stream_t:.1f}, peak memory x{legacy_mem / stream_mem:.1f} lower")
+
+    same = (
+        legacy_df[["Scheme", "NAV", "Date"]].reset_index(drop=True)
+        .equals(stream_df[["Scheme", "NAV", "Date"]].reset_index(drop=True))
+    )
+    print("✅ Outputs match." if same else "⚠️ Outputs differ.")
+
+
+if __name__ == "__main__":
+    main()
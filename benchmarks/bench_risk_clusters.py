@@ -0,0 +1,110 @@
+# bench_risk_clusters.py
+#
+# Fit time and label stability of the phase 4-5 risk clustering
+# (pipeline/risk_model.py): KMeans over every daily row as before, against
+# MiniBatchKMeans over the rows and KMeans over per-scheme or per-scheme-
+# month aggregates. Stability is the mean adjusted Rand index of the row
+# labels across random seeds; purity is the share of schemes whose rows
+# all land in one cluster.
+#
+#   python benchmarks/bench_risk_clusters.py --schemes 500
+#   python benchmarks/bench_risk_clusters.py --input "AFTER_PHASE_3(transformation).csv"
+
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pipeline import risk_model  # noqa: E402
+from pipeline.snapshot import read_table  # noqa: E402
+
+
+CONFIGS = [
+    ("row", "kmeans"),
+    ("row", "minibatch"),
+    ("scheme_month", "kmeans"),
+    ("scheme", "kmeans"),
+]
+
+
+def make_fixture(n_schemes, years, seed):
+    """
+    Daily rows for schemes drawn from three latent risk profiles. Scheme-level
+    features are constant per scheme, monthly and yearly ones per period, and
+    every row carries some noise.
+    """
+    rng = np.random.default_rng(seed)
+    calendar = pd.bdate_range(end="2025-03-31", periods=int(years * 252))
+    months = calendar.to_numpy().astype("datetime64[M]").astype("int64")
+    years_ = months // 12 - months[0] // 12
+    months = months - months[0]
+    profiles = np.array([[0.05, 0.3, -0.2], [0.10, 0.8, -0.8], [0.15, 1.6, -1.6]])
+
+    frames = []
+    for scheme_id in range(1, n_schemes + 1):
+        ret, vol, dd = profiles[rng.integers(3)] + rng.normal(0, 0.15, 3)
+        vol = abs(vol)
+        n = len(calendar)
+        month_ret = rng.normal(ret, vol, months.max() + 1)[months]
+        year_ret = rng.normal(ret, vol / 2, years_.max() + 1)[years_]
+        frames.append(pd.DataFrame({
+            "SchemeID": scheme_id,
+            "Date": calendar,
+            "Yearly_Return_winsorized": year_ret,
+            "Monthly_Return_winsorized": month_ret,
+            "Yearly_STD_winsorized": vol + rng.normal(0, 0.02, n),
+            "Monthly_STD_winsorized": vol / 3 + rng.normal(0, 0.02, n),
+            "Max_Drawdown_winsorized": dd + rng.normal(0, 0.02, n),
+            "Sharpe_Ratio_log_normalize": np.log1p(max(ret / vol, 0)) + rng.normal(0, 0.02, n),
+            "CAGR_1Y_winsorized": ret + rng.normal(0, 0.02, n),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def run(df, level, algorithm, seed):
+    start = time.perf_counter()
+    X, unit_ids = risk_model.aggregate_features(df, risk_model.RISK_FEATURES, level=level)
+    *_, labels = risk_model.fit_risk_clusters(X, algorithm=algorithm, random_state=seed)
+    row_labels = risk_model.broadcast_labels(labels, unit_ids)
+    return row_labels, len(X), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare risk clustering levels and algorithms.")
+    parser.add_argument("--input", help="AFTER_PHASE_3 file; synthetic if omitted")
+    parser.add_argument("--schemes", type=int, default=500)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42, 0, 1])
+    args = parser.parse_args()
+
+    if args.input:
+        df = read_table(args.input, columns=["SchemeID", "Date"] + risk_model.RISK_FEATURES,
+                        parse_dates=["Date"])
+    else:
+        df = make_fixture(args.schemes, args.years, args.seeds[0])
+    print(f"rows: {len(df)}, schemes: {df['SchemeID'].nunique()}")
+
+    baseline = None
+    print(f"{'level / algorithm':<26}{'units':>10}{'fit s':>9}{'seed ARI':>10}{'purity':>9}{'ARI vs row':>12}")
+    for level, algorithm in CONFIGS:
+        runs = [run(df, level, algorithm, seed) for seed in args.seeds]
+        labels = [row_labels for row_labels, _, _ in runs]
+        if baseline is None:
+            baseline = labels[0]
+        stability = np.mean([adjusted_rand_score(a, b) for a, b in itertools.combinations(labels, 2)])
+        purity = risk_model.scheme_purity(df.loc[labels[0].index, "SchemeID"], labels[0])
+        vs_row = adjusted_rand_score(baseline.loc[labels[0].index], labels[0])
+        seconds = np.mean([s for _, _, s in runs])
+        print(f"{level + ' / ' + algorithm:<26}{runs[0][1]:>10}{seconds:>9.2f}{stability:>10.3f}"
+              f"{purity:>9.1%}{vs_row:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# bench_snapshot_io.py
+#
+# Measures load time and on-disk size of a phase output as CSV versus its
+# columnar snapshot (see pipeline/snapshot.py).
+#
+#   python benchmarks/bench_snapshot_io.py phase5_processed_funds_data_final.csv
+#   python benchmarks/bench_snapshot_io.py after_phase_2.csv --columns SchemeID Scheme
+
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pipeline.snapshot import convert_csv, read_snapshot, snapshot_path  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV against columnar snapshots.")
+    parser.add_argument("csv", help="Phase output CSV (its snapshot is written if missing)")
+    parser.add_argument("--columns", nargs="+", default=["SchemeID", "Date", "NAV"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(snapshot_path(args.csv)):
+        convert_csv(args.csv)
+
+    date_cols = [col for col in ["Date"] if col in args.columns]
+    timings = {
+        "csv, all columns": best_of(lambda: pd.read_csv(args.csv, low_memory=False), args.repeat),
+        "snapshot, all columns": best_of(lambda: read_snapshot(args.csv), args.repeat),
+        f"csv, {len(args.columns)} columns": best_of(
+            lambda: pd.read_csv(args.csv, usecols=args.columns, parse_dates=date_cols), args.repeat),
+        f"snapshot, {len(args.columns)} columns": best_of(
+            lambda: read_snapshot(args.csv, args.columns), args.repeat),
+    }
+
+    csv_size = os.path.getsize(args.csv)
+    snap_size = os.path.getsize(snapshot_path(args.csv))
+    print(f"size: csv {csv_size / 1e6:.1f} MB, snapshot {snap_size / 1e6:.1f} MB "
+          f"({snap_size / csv_size:.0%} of csv)")
+    for name, seconds in timings.items():
+        print(f"{name:<28}{seconds * 1e3:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# feature_store.py
+
+
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from nav_live_merge import merge_live_with_features
+from risk_inference import live_risk_scorer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))  # repo root
+from pipeline.snapshot import read_table, source_path
+
+
+FEATURES_PATH = "phase5_processed_funds_data_final.csv"
+
+
+class FeatureStore:
+    """
+    In-memory snapshot of the phase 5 feature file, loaded once at startup.
+    Keeps only the latest row per SchemeID (with a normalized Scheme column),
+    so requests filter a few thousand rows instead of re-reading the history.
+    The file is reloaded when its modification time changes.
+    """
+
+    def __init__(self, path=FEATURES_PATH):
+        self.path = path
+        self.version = 0
+        self._latest = None
+        self._mtime = None
+        self._universe = (None, None, None, None)
+        self._lock = threading.RLock()
+
+    def load(self):
+        with self._lock:
+            mtime = os.path.getmtime(source_path(self.path))
+            df = read_table(self.path, parse_dates=["Date"])
+            df["Scheme"] = df["Scheme"].astype(str).str.strip().str.lower()
+
+            # 📦 Latest row per SchemeID
+            latest = df.sort_values("Date").groupby("SchemeID").tail(1).reset_index(drop=True)
+
+            self._latest = latest
+            self._mtime = mtime
+            self.version += 1
+
+        print(f"✅ Feature store loaded: {len(df)} rows → {len(latest)} schemes (version {self.version}).")
+        return latest
+
+    def _is_stale(self):
+        if self._latest is None:
+            return True
+        try:
+            return os.path.getmtime(source_path(self.path)) != self._mtime
+        except OSError:
+            return False
+
+    def snapshot(self):
+        """
+        Returns the latest-row-per-SchemeID frame, reloading it if the file changed.
+        Callers must treat the returned frame as read-only.
+        """
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self.load()
+        return self._latest
+
+    def universe(self, live_nav_df):
+        """
+        Returns the feature snapshot merged with live NAVs, plus the schemes
+        only known from live data with their model-scored risk levels. The
+        merge is cached until the feature file, the live NAV snapshot or the
+        live scores change, so indexes derived from the returned frame can be
+        reused across requests.
+        """
+        snapshot = self.snapshot()
+        live_scored = live_risk_scorer.scored()
+        cached_snapshot, cached_live, cached_scored, merged = self._universe
+        if cached_snapshot is snapshot and cached_live is live_nav_df and cached_scored is live_scored:
+            return merged
+
+        merged = merge_live_with_features(snapshot, live_nav_df)
+        if live_scored is not None:
+            merged = pd.concat([merged, live_scored[merged.columns]], ignore_index=True)
+            print(f"🆕 Universe extended with {len(live_scored)} live-only schemes.")
+        self._universe = (snapshot, live_nav_df, live_scored, merged)
+        return merged
+
+
+feature_store = FeatureStore()
@@ -5,6 +5,7 @@ from jose import jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+from typing import List
 import pandas as pd
 
 
@@ -13,9 +14,16 @@ from models import User
 import models
 
 
-from nav_live_fetcher import fetch_latest_nav
-from nav_live_merge import merge_live_with_features
-from recommend_logic import recommend_for_existing_investor, recommend_for_new_investor
+from feature_store import feature_store
+from nav_live_cache import live_nav_cache
+from risk_inference import live_risk_scorer
+from scheme_metadata import scheme_metadata
+from recommend_logic import (
+    recommend_for_existing_investor,
+    recommend_for_existing_portfolio,
+    recommend_for_new_investor,
+    recommend_for_new_investors_bulk,
+)
 
 
 # ------------------
@@ -36,6 +44,27 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def load_feature_store():
+    feature_store.load()
+
+
+@app.on_event("startup")
+def load_risk_model():
+    if live_risk_scorer.load():
+        live_nav_cache.add_listener(lambda df: live_risk_scorer.update(df, feature_store.snapshot()))
+
+
+@app.on_event("startup")
+def start_live_nav_cache():
+    live_nav_cache.start()
+
+
+@app.on_event("shutdown")
+def stop_live_nav_cache():
+    live_nav_cache.stop()
+
+
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -62,6 +91,10 @@ class ExistingInvestorRequest(BaseModel):
     purchase_date: str
 
 
+class PortfolioRequest(BaseModel):
+    holdings: List[ExistingInvestorRequest]
+
+
 class NewInvestorRequest(BaseModel):
     budget: float
     risk_level: str
@@ -69,6 +102,10 @@ class NewInvestorRequest(BaseModel):
     market_cap: str
 
 
+class BulkNewInvestorRequest(BaseModel):
+    profiles: List[NewInvestorRequest]
+
+
 # ------------------
 # Auth Utility Functions
 # ------------------
@@ -125,12 +162,8 @@ def login(user: UserCreate, db: Session = Depends(get_db)):
 @app.post("/recommend/existing")
 def existing_investor(data: ExistingInvestorRequest):
     try:
-        feature_df = pd.read_csv("phase5_processed_funds_data_final.csv", parse_dates=["Date"])
-        feature_df["Scheme"] = feature_df["Scheme"].astype(str).str.strip().str.lower()
-
-
-        live_nav_df = fetch_latest_nav()
-        df = merge_live_with_features(feature_df, live_nav_df)
+        live_nav_df = live_nav_cache.get()
+        df = feature_store.universe(live_nav_df)
 
 
         return recommend_for_existing_investor(
@@ -145,15 +178,30 @@ def existing_investor(data: ExistingInvestorRequest):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.post("/recommend/new")
-def new_investor(data: NewInvestorRequest):
+@app.post("/recommend/existing/batch")
+def existing_investor_batch(data: PortfolioRequest):
     try:
-        feature_df = pd.read_csv("phase5_processed_funds_data_final.csv", parse_dates=["Date"])
-        feature_df["Scheme"] = feature_df["Scheme"].astype(str).str.strip().str.lower()
+        live_nav_df = live_nav_cache.get()
+        df = feature_store.universe(live_nav_df)
 
 
-        live_nav_df = fetch_latest_nav()
-        df = merge_live_with_features(feature_df, live_nav_df)
+        return recommend_for_existing_portfolio(
+            df,
+            [h.scheme_id for h in data.holdings],
+            [h.nav_at_purchase for h in data.holdings],
+            [h.units_held for h in data.holdings],
+            [h.purchase_date for h in data.holdings]
+        )
+    except Exception as e:
+        print("❌ Error in /recommend/existing/batch:", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@app.post("/recommend/new")
+def new_investor(data: NewInvestorRequest):
+    try:
+        live_nav_df = live_nav_cache.get()
+        df = feature_store.universe(live_nav_df)
 
 
         print("\n🟨 New Investor Input Debug:")
@@ -183,10 +231,29 @@ def new_investor(data: NewInvestorRequest):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.post("/recommend/new/bulk")
+def new_investor_bulk(data: BulkNewInvestorRequest):
+    try:
+        live_nav_df = live_nav_cache.get()
+        df = feature_store.universe(live_nav_df)
+
+
+        profiles = pd.DataFrame({
+            "budget": [p.budget for p in data.profiles],
+            "risk_level": [p.risk_level for p in data.profiles],
+            "asset_class": [p.asset_class for p in data.profiles],
+            "market_cap": [p.market_cap for p in data.profiles]
+        })
+        return recommend_for_new_investors_bulk(df, profiles)
+    except Exception as e:
+        print("❌ Error in /recommend/new/bulk:", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @app.get("/schemes")
 def get_scheme_list():
-    schemes_1 = pd.read_csv("phase5_processed_funds_data_final.csv", usecols=["SchemeID"])
-    schemes_2 = pd.read_csv("AFTER_PHASE_2_with_balance_FINAL.csv", usecols=["SchemeID", "Scheme"])
-    schemes_2["Scheme"] = schemes_2["Scheme"].astype(str).str.strip().str.lower()
-    merged = pd.merge(schemes_1.drop_duplicates(), schemes_2.drop_duplicates(), on="SchemeID", how="left")
+    schemes_1 = feature_store.snapshot()[["SchemeID"]].sort_values("SchemeID")
+    schemes_2 = scheme_metadata.pairs()
+    schemes_2 = schemes_2.assign(Scheme=schemes_2["Scheme"].str.lower())
+    merged = pd.merge(schemes_1, schemes_2, on="SchemeID", how="left")
     return merged.dropna().drop_duplicates().to_dict(orient="records")
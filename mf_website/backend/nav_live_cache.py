@@ -0,0 +1,131 @@
+# nav_live_cache.py
+
+
+import os
+import threading
+import time
+
+from nav_live_fetcher import fetch_latest_nav
+
+
+# AMFI publishes NAVAll.txt once a day; re-check hourly by default.
+NAV_REFRESH_SECONDS = int(os.getenv("NAV_REFRESH_SECONDS", "3600"))
+# After a failed fetch, don't let cold-start requests retry AMFI before this.
+NAV_RETRY_SECONDS = int(os.getenv("NAV_RETRY_SECONDS", "60"))
+
+
+class LiveNavCache:
+    """
+    Stale-while-revalidate cache around fetch_latest_nav().
+    A background thread refreshes the snapshot every `refresh_seconds`;
+    requests always get the last good snapshot, and concurrent refreshes
+    share a single download.
+    """
+
+    def __init__(self, fetch=fetch_latest_nav, refresh_seconds=NAV_REFRESH_SECONDS,
+                 retry_seconds=NAV_RETRY_SECONDS):
+        self._fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+
+        self.version = 0
+        self.fetched_at = None
+        self.last_error = None
+        self._df = None
+        self._failed_at = None
+
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """
+        Downloads a fresh snapshot. If a refresh is already running, waits
+        for it instead of starting another download. On failure the previous
+        snapshot is kept.
+        """
+        with self._lock:
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if not leader:
+            inflight.wait()
+            return self._df
+
+        try:
+            df = self._fetch()
+            with self._lock:
+                self._df = df
+                self.fetched_at = time.time()
+                self.version += 1
+                self.last_error = None
+                self._failed_at = None
+            self._notify(df)
+        except Exception as e:
+            with self._lock:
+                self.last_error = e
+                self._failed_at = time.time()
+            print("⚠️ Live NAV refresh failed, serving last snapshot:", e)
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+
+        return self._df
+
+    def add_listener(self, listener):
+        """Registers listener(df), called from the refreshing thread after each successful fetch."""
+        self._listeners.append(listener)
+
+    def _notify(self, df):
+        for listener in self._listeners:
+            try:
+                listener(df)
+            except Exception as e:
+                print("⚠️ Live NAV listener failed:", e)
+
+    def get(self):
+        """
+        Returns the last good live NAV snapshot without waiting on AMFI.
+        Only the very first request (before any snapshot exists) blocks.
+        """
+        df = self._df
+        if df is not None:
+            if self._is_expired() and self._inflight is None and not self._recently_failed():
+                threading.Thread(target=self.refresh, daemon=True).start()
+            return df
+
+        if self._recently_failed():
+            raise RuntimeError(f"❌ Live NAVs unavailable: {self.last_error}")
+
+        df = self.refresh()
+        if df is None:
+            raise RuntimeError(f"❌ Live NAVs unavailable: {self.last_error}")
+        return df
+
+    def _is_expired(self):
+        return self.fetched_at is None or time.time() - self.fetched_at >= self.refresh_seconds
+
+    def _recently_failed(self):
+        return self._failed_at is not None and time.time() - self._failed_at < self.retry_seconds
+
+    def _run(self):
+        self.refresh()
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="live-nav-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+live_nav_cache = LiveNavCache()
@@ -1,18 +1,77 @@
 # nav_live_fetcher.py
 
 
+import csv
+import os
+
 import requests
 import pandas as pd
-from io import StringIO
-from datetime import datetime
+
+
+NAVALL_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+NAVALL_COLUMNS = ["SchemeCode", "ISIN_1", "ISIN_2", "Scheme", "NAV", "Date"]
+# Section header, e.g. "Open Ended Schemes(Equity Scheme - Large Cap Fund)"
+CATEGORY_HEADER = r"^\s*[^();]*Schemes?\s*\((.+)\)\s*$"
+SCHEME_CATEGORIES_PATH = "amfi_scheme_categories.csv"
+
+
+def parse_navall(stream, encoding="utf-8"):
+    """
+    Parses NAVAll.txt from a file-like object in a single streaming pass.
+    The C parser reads the body in chunks straight into typed columns. Each
+    section header's SEBI category (e.g. "Equity Scheme - Large Cap Fund") is
+    carried down to the schemes listed under it; the header, fund house and
+    blank lines themselves drop out.
+    Returns a DataFrame with columns: SchemeCode, Scheme, NAV, Date, Category.
+    """
+    df = pd.read_csv(
+        stream,
+        sep=";",
+        header=None,
+        names=NAVALL_COLUMNS,
+        usecols=["SchemeCode", "Scheme", "NAV", "Date"],
+        dtype=str,
+        quoting=csv.QUOTE_NONE,
+        on_bad_lines="skip",
+        encoding=encoding,
+        encoding_errors="replace",
+    )
+
+    # 📌 Headers come through as one-field rows; forward-fill their category
+    headers = df["SchemeCode"].where(df["Scheme"].isna())
+    df["Category"] = headers.str.extract(CATEGORY_HEADER, expand=False).str.strip().ffill()
+
+    # Clean and convert types
+    df["SchemeCode"] = pd.to_numeric(df["SchemeCode"], errors="coerce")
+    df["NAV"] = pd.to_numeric(df["NAV"], errors="coerce")
+    df["Date"] = pd.to_datetime(df["Date"], format="%d-%b-%Y", errors="coerce")
+
+    # Drop headers, comments and rows with invalid NAV or Date
+    df = df.dropna(subset=["SchemeCode", "Scheme", "NAV", "Date"])
+    df["SchemeCode"] = df["SchemeCode"].astype("int64")
+    df["Scheme"] = df["Scheme"].str.strip().str.lower()
+
+    return df.reset_index(drop=True)
+
+
+def save_scheme_categories(df, path=SCHEME_CATEGORIES_PATH):
+    """
+    Persists the scheme name → SEBI category table from a parsed NAVAll.txt,
+    for the phase 2 classifier and for schemes we only know from live data.
+    """
+    categories = df[["SchemeCode", "Scheme", "Category"]].dropna().drop_duplicates("SchemeCode")
+    tmp_path = f"{path}.tmp"
+    categories.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
 
 
 def fetch_latest_nav():
     """
     Fetch the latest NAVs from AMFI's NAVAll.txt file.
-    Cleans and returns a usable DataFrame with columns: Scheme, NAV, Date.
+    Streams and parses the response body and refreshes the saved scheme
+    categories; returns a DataFrame with columns:
+    SchemeCode, Scheme, NAV, Date, Category.
     """
-    url = "https://www.amfiindia.com/spages/NAVAll.txt"
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
         "Accept": "text/plain",
@@ -21,39 +80,20 @@ def fetch_latest_nav():
 
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        with requests.get(NAVALL_URL, headers=headers, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            df = parse_navall(response.raw, encoding=response.encoding or "utf-8")
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"❌ Failed to fetch NAVAll.txt: {e}")
 
 
-    # Read the raw text lines
-    content = response.text
-    lines = content.splitlines()
-
-
-    # Keep only valid lines with 6 columns and skip headers/comments
-    valid_lines = []
-    for line in lines:
-        parts = line.split(';')
-        if len(parts) == 6 and not line.startswith(('Scheme Code', ';')) and line.strip():
-            valid_lines.append(line)
-
-
-    # Parse into DataFrame
-    df = pd.read_csv(StringIO("\n".join(valid_lines)), sep=';', header=None)
-    df.columns = ["SchemeCode", "ISIN_1", "ISIN_2", "Scheme", "NAV", "Date"]
-
-
-    # Clean and convert types
-    df.dropna(subset=["Scheme", "NAV"], inplace=True)
-    df["NAV"] = pd.to_numeric(df["NAV"], errors="coerce")
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df["Scheme"] = df["Scheme"].astype(str).str.strip().str.lower()
-
-
-    # Drop rows with invalid NAV or Date
-    df = df.dropna(subset=["NAV", "Date"])
+    # 💾 Keep the scheme → SEBI category table for the classifier
+    if not df.empty:
+        try:
+            save_scheme_categories(df)
+        except OSError as e:
+            print("⚠️ Could not save scheme categories:", e)
 
 
     # ✅ Optional: print the most recent date to verify freshness
@@ -64,4 +104,4 @@ def fetch_latest_nav():
         print("⚠️ No valid NAV data found.")
 
 
-    return df[["Scheme", "NAV", "Date"]]
+    return df
@@ -1,40 +1,100 @@
 # nav_live_merge.py
 
 
+import os
+import threading
+
 import pandas as pd
 
+from scheme_metadata import scheme_metadata
 
-def merge_live_with_features(feature_df, live_nav_df):
+
+SCHEME_CODE_INDEX_PATH = "scheme_code_index.csv"
+
+
+class SchemeCodeIndex:
     """
-    Merges live NAVs (AMFI) with latest schemeID-based features.
-    Always replaces NAV and Date with live values where available.
+    Persisted mapping from AMFI SchemeCode to our SchemeID.
+    Built by matching scheme names once, then extended incrementally when
+    NAVAll.txt contains codes we have not seen before. Codes that cannot be
+    matched by name are reported and not retried until the next restart.
     """
 
+    def __init__(self, path=SCHEME_CODE_INDEX_PATH):
+        self.path = path
+        self.pairs = None
+        self.unmatched = set()
+        self._lock = threading.Lock()
 
-    # 📌 Load scheme name mapping to get SchemeID from live NAV data (AMFI uses SchemeCode)
-    try:
-        mapping_df = pd.read_csv("AFTER_PHASE_2_with_balance_FINAL.csv", usecols=["SchemeID", "Scheme"])
-        mapping_df["Scheme"] = mapping_df["Scheme"].astype(str).str.strip().str.lower()
-        mapping_df = mapping_df.drop_duplicates()
-    except Exception as e:
-        raise RuntimeError(f"❌ Failed to load mapping file: {e}")
+    def _load(self):
+        if os.path.exists(self.path):
+            pairs = pd.read_csv(self.path, dtype={"SchemeCode": "int64", "SchemeID": "int64"})
+        else:
+            pairs = pd.DataFrame({"SchemeCode": pd.Series(dtype="int64"), "SchemeID": pd.Series(dtype="int64")})
+        print(f"✅ Scheme code index loaded: {len(pairs)} codes.")
+        return pairs
 
+    def update(self, live_nav_df):
+        """
+        Maps any new SchemeCodes in live_nav_df by scheme name and persists them.
+        Returns the (SchemeCode, SchemeID) pairs.
+        """
+        with self._lock:
+            if self.pairs is None:
+                self.pairs = self._load()
 
-    # 📌 Normalize schemes in live data
-    live_nav_df = live_nav_df.copy()
-    live_nav_df["Scheme"] = live_nav_df["Scheme"].astype(str).str.strip().str.lower()
+            live_codes = live_nav_df[["SchemeCode", "Scheme"]].drop_duplicates("SchemeCode")
+            known = live_codes["SchemeCode"].isin(self.pairs["SchemeCode"]) | live_codes["SchemeCode"].isin(self.unmatched)
+            new_codes = live_codes[~known]
+            if new_codes.empty:
+                return self.pairs
 
+            # 📌 Resolve the new codes by scheme name (AMFI uses SchemeCode)
+            mapping_df = scheme_metadata.pairs()
+            mapping_df = mapping_df.assign(Scheme=mapping_df["Scheme"].str.lower()).drop_duplicates()
 
-    # 🔄 Merge live NAVs with mapping file to get SchemeID
-    live_with_id = pd.merge(
-        live_nav_df,
-        mapping_df,
-        on="Scheme",
-        how="left"
-    ).dropna(subset=["SchemeID"])
+            new_codes = new_codes.assign(Scheme=new_codes["Scheme"].astype(str).str.strip().str.lower())
+            matched = pd.merge(new_codes, mapping_df, on="Scheme", how="inner")
+            matched = matched[["SchemeCode", "SchemeID"]].astype("int64")
+
+            unmatched = new_codes[~new_codes["SchemeCode"].isin(matched["SchemeCode"])]
+            self.unmatched.update(unmatched["SchemeCode"].tolist())
+
+            if not matched.empty:
+                self.pairs = pd.concat([self.pairs, matched], ignore_index=True)
+                tmp_path = f"{self.path}.tmp"
+                self.pairs.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, self.path)
+
+            print(f"🆕 Scheme code index: {matched['SchemeCode'].nunique()} new codes mapped, "
+                  f"{len(unmatched)} unmatched.")
+            if not unmatched.empty:
+                print(f"⚠️ Unmatched SchemeCodes (sample):\n{unmatched.head(10).to_string(index=False)}")
+
+            return self.pairs
 
 
-    live_with_id["SchemeID"] = live_with_id["SchemeID"].astype(int)
+scheme_code_index = SchemeCodeIndex()
+
+
+def merge_live_with_features(feature_df, live_nav_df):
+    """
+    Merges live NAVs (AMFI) with latest schemeID-based features.
+    Always replaces NAV and Date with live values where available.
+    """
+
+
+    # 📌 Resolve SchemeCode → SchemeID through the persisted index
+    pairs = scheme_code_index.update(live_nav_df)
+
+
+    # 🔄 Integer join of live NAVs with the index to get SchemeID
+    live_with_id = pd.merge(
+        live_nav_df[["SchemeCode", "NAV", "Date"]],
+        pairs,
+        on="SchemeCode",
+        how="inner"
+    )
 
 
     # 🔁 Keep only latest NAV per SchemeID
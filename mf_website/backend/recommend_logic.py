@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from scheme_metadata import scheme_metadata
+
 # ------------------------
 # Asset Class and Market Cap Maps
 # ------------------------
@@ -26,111 +29,351 @@ market_cap_map = {
 }
 
 # ------------------------
-# For New Investors
+# Scoring
+# ------------------------
+def score_funds(df):
+    return (
+        df["Sharpe_Ratio"].fillna(0) * 0.5 +
+        df["CAGR_1Y_winsorized"].fillna(0) * 0.3 -
+        df["Max_Drawdown_winsorized"].fillna(0) * 0.2
+    )
+
 # ------------------------
-def recommend_for_new_investor(df, budget, risk_level, asset_class=None, market_cap=None, top_n=5):
-    df = df.copy()
-    df["Risk_Level"] = df["Risk_Level"].astype(str).str.strip().str.lower()
+# Budget Frontier
+# ------------------------
+class BudgetFrontier:
+    """
+    Materialized view for new-investor queries. For each (risk, asset class,
+    market cap) filter combination it keeps the funds sorted by NAV together
+    with the running top-N by score, so any budget is answered with a binary
+    search. Built from the latest row per SchemeID; views are built lazily.
+    """
+
+    def __init__(self, df):
+        rows = df[df["NAV"].notnull() & (df["NAV"] > 0)]
+        rows = rows.sort_values("Date").groupby("SchemeID").tail(1).reset_index(drop=True)
+        rows["score"] = score_funds(rows)
+        self.rows = rows
+
+        self._risk = rows["Risk_Level"].astype(str).str.strip().str.lower().to_numpy()
+        self._asset_class = rows["Balanced_AssetClass"].to_numpy()
+        self._market_cap = rows["Balanced_MarketCap"].to_numpy()
+
+        # Filter combinations that match at least one fund, ignoring NAV and budget
+        risk_all = df["Risk_Level"].astype(str).str.strip().str.lower()
+        self.present = set()
+        for risk, ac, mc in set(zip(risk_all, df["Balanced_AssetClass"], df["Balanced_MarketCap"])):
+            self.present.update({(risk, ac, None), (risk, None, mc), (risk, ac, mc)})
 
-    # Step 1: Risk filter
-    filtered = df[df["Risk_Level"] == risk_level.lower()]
-    print(f"✅ After risk filter ({risk_level}): {len(filtered)}")
+        self._views = {}
 
-    # Step 2: Asset class filter
-    if asset_class:
-        ac_code = asset_class_map.get(asset_class.lower())
+    def resolve(self, risk, ac_code=None, mc_code=None):
+        """
+        Applies the asset-class and market-cap filters only when they leave at
+        least one fund, mirroring the step-by-step filtering of the recommender.
+        """
+        if ac_code is not None and (risk, ac_code, None) not in self.present:
+            ac_code = None
+        if mc_code is not None and (risk, ac_code, mc_code) not in self.present:
+            mc_code = None
+        return risk, ac_code, mc_code
+
+    def _view(self, key, top_n):
+        view = self._views.get((key, top_n))
+        if view is not None:
+            return view
+
+        risk, ac_code, mc_code = key
+        mask = self._risk == risk
         if ac_code is not None:
-            temp = filtered[filtered["Balanced_AssetClass"] == ac_code]
-            print(f"🟨 Asset Class '{asset_class}': {len(temp)}")
-            if not temp.empty:
-                filtered = temp
-
-    # Step 3: Market cap filter
-    if market_cap:
-        mc_code = market_cap_map.get(market_cap.lower())
+            mask &= self._asset_class == ac_code
         if mc_code is not None:
-            temp = filtered[filtered["Balanced_MarketCap"] == mc_code]
-            print(f"🟨 Market Cap '{market_cap}': {len(temp)}")
-            if not temp.empty:
-                filtered = temp
+            mask &= self._market_cap == mc_code
+
+        positions = np.flatnonzero(mask)
+        positions = positions[np.argsort(self.rows["NAV"].to_numpy()[positions], kind="stable")]
+        scores = self.rows["score"].to_numpy()
+
+        # Running top-N by score over funds in ascending NAV order
+        top = np.full((len(positions), top_n), -1)
+        current = []
+        for i, pos in enumerate(positions):
+            score = scores[pos]
+            if len(current) < top_n or score > scores[current[-1]]:
+                j = len(current)
+                while j > 0 and scores[current[j - 1]] < score:
+                    j -= 1
+                current.insert(j, pos)
+                del current[top_n:]
+            top[i, :len(current)] = current
+
+        view = (self.rows["NAV"].to_numpy()[positions], top)
+        self._views[(key, top_n)] = view
+        return view
+
+    def query(self, key, budget, top_n=5):
+        """Returns row positions of the top_n funds with NAV <= budget, best first."""
+        best = self.query_many(key, [budget], top_n)[0]
+        return best[best >= 0].tolist()
+
+    def query_many(self, key, budgets, top_n=5):
+        """
+        Vectorized query: returns an (n_budgets, top_n) array of row positions,
+        best first, padded with -1.
+        """
+        navs, top = self._view(key, top_n)
+        k = np.searchsorted(navs, np.asarray(budgets, dtype=float), side="right")
+        best = np.full((len(k), top_n), -1)
+        found = k > 0
+        if len(top):
+            best[found] = top[k[found] - 1]
+        return best
+
+
+_frontier_cache = (None, None)
 
-    # Step 4: Budget filter
-    filtered = filtered[filtered["NAV"].notnull() & (filtered["NAV"] > 0)]
-    filtered = filtered[filtered["NAV"] <= budget]
-    print(f"💰 After budget filter (≤ {budget}): {len(filtered)}")
+
+def budget_frontier_for(df):
+    """Returns the BudgetFrontier for df, rebuilding it only when a different frame is passed."""
+    global _frontier_cache
+    cached_df, frontier = _frontier_cache
+    if cached_df is not df:
+        frontier = BudgetFrontier(df)
+        _frontier_cache = (df, frontier)
+    return frontier
+
+# ------------------------
+# For New Investors
+# ------------------------
+def _filter_codes(asset_class, market_cap):
+    ac_code = asset_class_map.get(asset_class.lower()) if isinstance(asset_class, str) and asset_class else None
+    mc_code = market_cap_map.get(market_cap.lower()) if isinstance(market_cap, str) and market_cap else None
+    return ac_code, mc_code
+
+
+def recommend_for_new_investor(df, budget, risk_level, asset_class=None, market_cap=None, top_n=5, frontier=None):
+    if frontier is None:
+        frontier = budget_frontier_for(df)
+
+    ac_code, mc_code = _filter_codes(asset_class, market_cap)
+
+    # Steps 1-4: Risk, asset class, market cap and budget filters
+    key = frontier.resolve(risk_level.lower(), ac_code, mc_code)
+    positions = frontier.query(key, budget, top_n)
+    print(f"💰 Filters {key}, budget ≤ {budget}: {len(positions)} funds")
 
     # Fallback: Risk + budget only if nothing found
-    if filtered.empty:
-        fallback = df[(df["Risk_Level"] == risk_level.lower()) & (df["NAV"] <= budget)]
-        if not fallback.empty:
+    if not positions:
+        positions = frontier.query((risk_level.lower(), None, None), budget, top_n)
+        if positions:
             print("🔁 Fallback used (risk + budget only)")
-            filtered = fallback
         else:
             return {"message": "❌ No funds match your criteria. Try increasing budget or changing filters."}
 
-    # Step 5: Latest NAV per SchemeID
-    filtered = filtered.sort_values("Date").groupby("SchemeID").tail(1).drop_duplicates("SchemeID")
-
-    # Step 6: Score calculation
-    filtered["score"] = (
-        filtered["Sharpe_Ratio"].fillna(0) * 0.5 +
-        filtered["CAGR_1Y_winsorized"].fillna(0) * 0.3 -
-        filtered["Max_Drawdown_winsorized"].fillna(0) * 0.2
-    )
+    # Steps 5-6: Latest NAV per SchemeID, ranked by score
+    result = frontier.rows.iloc[positions]
 
     # Step 7: Units purchasable
-    filtered["Units_Purchasable"] = (budget // filtered["NAV"]).astype(int)
+    result = result.assign(Units_Purchasable=(budget // result["NAV"]).astype(int))
 
     # Step 8: Add scheme name from mapping
     try:
-        name_map = pd.read_csv("AFTER_PHASE_2_with_balance_FINAL.csv", usecols=["SchemeID", "Scheme"])
-        name_map["Scheme"] = name_map["Scheme"].astype(str).str.strip()
-        filtered = pd.merge(filtered, name_map.drop_duplicates(), on="SchemeID", how="left", suffixes=('', '_Original'))
-        filtered["Scheme_Name"] = filtered["Scheme_Original"]
-        filtered.drop(columns=["Scheme_Original"], inplace=True)
+        result = result.assign(Scheme_Name=result["SchemeID"].map(scheme_metadata.names()).fillna(result["Scheme"]))
     except Exception as e:
         print("⚠ Could not map scheme names:", e)
-        filtered["Scheme_Name"] = filtered["Scheme"]
+        result = result.assign(Scheme_Name=result["Scheme"])
 
-    result = filtered.sort_values("score", ascending=False).head(top_n)
     return result[["SchemeID", "Scheme_Name", "NAV", "Units_Purchasable"]].to_dict(orient="records")
 
+
+def recommend_for_new_investors_bulk(df, profiles, top_n=5, frontier=None):
+    """
+    Recommendations for many new-investor profiles at once. `profiles` is a
+    DataFrame with budget, risk_level, asset_class and market_cap columns.
+    Profiles are grouped by filter combination and each group's candidate set
+    is searched once for all of its budgets. Returns one result per profile,
+    in order, shaped like recommend_for_new_investor().
+    """
+    if frontier is None:
+        frontier = budget_frontier_for(df)
+
+    try:
+        names = scheme_metadata.names()
+    except Exception as e:
+        print("⚠ Could not map scheme names:", e)
+        names = None
+
+    scheme_ids = frontier.rows["SchemeID"].to_numpy()
+    navs = frontier.rows["NAV"].to_numpy()
+    schemes = frontier.rows["Scheme"].to_numpy()
+    budgets = profiles["budget"].to_numpy(dtype=float)
+    risks = profiles["risk_level"].astype(str).str.lower().to_numpy()
+    asset_classes = profiles["asset_class"] if "asset_class" in profiles else [None] * len(profiles)
+    market_caps = profiles["market_cap"] if "market_cap" in profiles else [None] * len(profiles)
+
+    # Steps 1-4: Group profiles by resolved filter combination
+    groups = {}
+    for i, (risk, asset_class, market_cap) in enumerate(zip(risks, asset_classes, market_caps)):
+        key = frontier.resolve(risk, *_filter_codes(asset_class, market_cap))
+        groups.setdefault(key, []).append(i)
+
+    best = np.full((len(profiles), top_n), -1)
+    for key, members in groups.items():
+        best[members] = frontier.query_many(key, budgets[members], top_n)
+
+    # Fallback: Risk + budget only for profiles with nothing found
+    fallback = np.flatnonzero(best[:, 0] < 0)
+    fallback_groups = {}
+    for i in fallback:
+        fallback_groups.setdefault((risks[i], None, None), []).append(i)
+    for key, members in fallback_groups.items():
+        best[members] = frontier.query_many(key, budgets[members], top_n)
+
+    results = []
+    for i in range(len(profiles)):
+        positions = best[i][best[i] >= 0]
+        if len(positions) == 0:
+            results.append({"message": "❌ No funds match your criteria. Try increasing budget or changing filters."})
+            continue
+        results.append([
+            {
+                "SchemeID": int(scheme_ids[pos]),
+                "Scheme_Name": names.get(scheme_ids[pos], schemes[pos]) if names is not None else schemes[pos],
+                "NAV": float(navs[pos]),
+                "Units_Purchasable": int(budgets[i] // navs[pos])
+            }
+            for pos in positions
+        ])
+
+    print(f"✅ Bulk recommendations: {len(profiles)} profiles, {len(groups)} filter combinations, "
+          f"{len(fallback)} fallbacks.")
+    return results
+
+# ------------------------
+# Peer Group Index
+# ------------------------
+PEER_KEYS = ["Balanced_AssetClass", "Balanced_MarketCap", "Risk_Level"]
+
+
+def peer_key(row):
+    return tuple(str(row[col]).strip().lower() for col in PEER_KEYS)
+
+
+class PeerIndex:
+    """
+    SchemeIDs grouped by (Balanced_AssetClass, Balanced_MarketCap, Risk_Level),
+    each group ranked best-first by score, plus row positions into the frame
+    the index was built from.
+    """
+
+    def __init__(self, df):
+        ids = df["SchemeID"].to_numpy()
+
+        # Latest row per SchemeID (the investor's own fund)
+        by_date = np.argsort(df["Date"].to_numpy(), kind="stable")
+        self.latest_position = dict(zip(ids[by_date], by_date))
+
+        # First row per SchemeID (peer candidates)
+        first = df.drop_duplicates(subset="SchemeID")
+        self.peer_position = dict(zip(first["SchemeID"], df.index.get_indexer(first.index)))
+
+        ranked = pd.DataFrame({col: first[col].astype(str).str.strip().str.lower() for col in PEER_KEYS})
+        ranked["SchemeID"] = first["SchemeID"]
+        ranked["score"] = score_funds(first)
+        ranked = ranked.sort_values("score", ascending=False, kind="mergesort")
+
+        self.groups = {
+            key: group["SchemeID"].to_numpy()
+            for key, group in ranked.groupby(PEER_KEYS, sort=False)
+        }
+
+    def best_alternative(self, key, scheme_id):
+        """Returns the best-scoring peer in the group other than scheme_id, or None."""
+        for peer_id in self.groups.get(key, [])[:2]:
+            if peer_id != scheme_id:
+                return peer_id
+        return None
+
+
+_peer_index_cache = (None, None)
+
+
+def peer_index_for(df):
+    """Returns the PeerIndex for df, rebuilding it only when a different frame is passed."""
+    global _peer_index_cache
+    cached_df, index = _peer_index_cache
+    if cached_df is not df:
+        index = PeerIndex(df)
+        _peer_index_cache = (df, index)
+    return index
+
 # ------------------------
 # For Existing Investors
 # ------------------------
-def recommend_for_existing_investor(df, scheme_id, nav_at_purchase, units_held, purchase_date, threshold_improvement=0.03):
-    df = df.copy()
-    for col in ["Balanced_AssetClass", "Balanced_MarketCap", "Risk_Level", "Scheme"]:
-        df[col] = df[col].astype(str).str.strip().str.lower()
+def recommend_for_existing_investor(df, scheme_id, nav_at_purchase, units_held, purchase_date, threshold_improvement=0.03,
+                                    peer_index=None):
+    return recommend_for_existing_portfolio(
+        df, [scheme_id], [nav_at_purchase], [units_held], [purchase_date], threshold_improvement, peer_index
+    )[0]
 
-    fund_data = df[df["SchemeID"] == scheme_id]
-    if fund_data.empty:
-        return {"error": "❌ SchemeID not found."}
 
-    fund_data = fund_data.sort_values("Date")
-    latest = fund_data.iloc[-1]
-    latest_nav = latest["NAV"]
-    latest_date = latest["Date"]
+def recommend_for_existing_portfolio(df, scheme_ids, navs_at_purchase, units_held, purchase_dates,
+                                     threshold_improvement=0.03, peer_index=None):
+    """
+    Hold/Switch verdicts for a whole portfolio against one frame, one result
+    per holding in input order. CAGR is computed for all holdings at once.
+    """
+    if peer_index is None:
+        peer_index = peer_index_for(df)
 
-    try:
-        purchase_dt = pd.to_datetime(purchase_date, dayfirst=False)
-    except:
-        return {"error": "❌ Invalid purchase date format."}
+    n = len(scheme_ids)
+    results = [None] * n
+    positions = np.full(n, -1)
+    purchase_dts = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    for i, scheme_id in enumerate(scheme_ids):
+        position = peer_index.latest_position.get(scheme_id)
+        if position is None:
+            results[i] = {"error": "❌ SchemeID not found."}
+            continue
+        try:
+            purchase_dt = pd.to_datetime(purchase_dates[i], dayfirst=False)
+            if pd.isnull(purchase_dt):
+                raise ValueError(purchase_dates[i])
+            purchase_dts[i] = purchase_dt.to_datetime64()
+        except:
+            results[i] = {"error": "❌ Invalid purchase date format."}
+            continue
+        positions[i] = position
+
+    # 📈 CAGR for every holding in one vectorized pass
+    valid = np.flatnonzero(positions >= 0)
+    latest = df.iloc[positions[valid]]
+    latest_navs = latest["NAV"].to_numpy(dtype=float)
+    holding_days = (latest["Date"].to_numpy(dtype="datetime64[ns]") - purchase_dts[valid]) // np.timedelta64(1, "D")
+    holding_years = holding_days / 365
+    purchase_navs = np.asarray(navs_at_purchase, dtype=float)[valid]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        user_cagrs = ((latest_navs / purchase_navs) ** (1 / holding_years)) - 1
+
+    for j, i in enumerate(valid):
+        if holding_years[j] <= 0:
+            results[i] = {"error": "❌ Purchase date must be in the past."}
+            continue
+        results[i] = _existing_verdict(
+            df, peer_index, scheme_ids[i], df.iloc[positions[i]], user_cagrs[j],
+            navs_at_purchase[i], units_held[i], threshold_improvement
+        )
 
-    holding_years = (latest_date - purchase_dt).days / 365
-    if holding_years <= 0:
-        return {"error": "❌ Purchase date must be in the past."}
+    return results
 
-    user_cagr = ((latest_nav / nav_at_purchase) ** (1 / holding_years)) - 1
 
-    similar = df[
-        (df["Balanced_AssetClass"] == latest["Balanced_AssetClass"]) &
-        (df["Balanced_MarketCap"] == latest["Balanced_MarketCap"]) &
-        (df["Risk_Level"] == latest["Risk_Level"]) &
-        (df["SchemeID"] != scheme_id)
-    ].drop_duplicates(subset="SchemeID")
+def _existing_verdict(df, peer_index, scheme_id, latest, user_cagr, nav_at_purchase, units_held, threshold_improvement):
+    latest_nav = latest["NAV"]
+
+    best_id = peer_index.best_alternative(peer_key(latest), scheme_id)
 
-    if similar.empty:
+    if best_id is None:
         return {
             "Current Fund ID": int(scheme_id),
             "Latest NAV": round(latest_nav, 2),
@@ -138,13 +381,7 @@ def recommend_for_existing_investor(df, scheme_id, nav_at_purchase, units_held,
             "Reason": "No similar peer funds found."
         }
 
-    similar["score"] = (
-        similar["Sharpe_Ratio"].fillna(0) * 0.5 +
-        similar["CAGR_1Y_winsorized"].fillna(0) * 0.3 -
-        similar["Max_Drawdown_winsorized"].fillna(0) * 0.2
-    )
-
-    best = similar.sort_values("score", ascending=False).iloc[0]
+    best = df.iloc[peer_index.peer_position[best_id]]
 
     is_better = (
         pd.notnull(best["CAGR_1Y"]) and
@@ -154,15 +391,12 @@ def recommend_for_existing_investor(df, scheme_id, nav_at_purchase, units_held,
     )
 
     try:
-        name_map = pd.read_csv("AFTER_PHASE_2_with_balance_FINAL.csv", usecols=["SchemeID", "Scheme"])
-        name_map = name_map.drop_duplicates().dropna()
-        name_map["Scheme"] = name_map["Scheme"].astype(str).str.strip()
-        scheme_dict = name_map.set_index("SchemeID")["Scheme"].to_dict()
-        your_scheme_name = scheme_dict.get(int(scheme_id), latest["Scheme"])
-        recommended_scheme_name = scheme_dict.get(int(best["SchemeID"]), best["Scheme"])
+        scheme_dict = scheme_metadata.names()
+        your_scheme_name = scheme_dict.get(int(scheme_id), str(latest["Scheme"]).strip().lower())
+        recommended_scheme_name = scheme_dict.get(int(best["SchemeID"]), str(best["Scheme"]).strip().lower())
     except:
-        your_scheme_name = latest["Scheme"]
-        recommended_scheme_name = best["Scheme"]
+        your_scheme_name = str(latest["Scheme"]).strip().lower()
+        recommended_scheme_name = str(best["Scheme"]).strip().lower()
 
     return {
         "Your_Fund": {
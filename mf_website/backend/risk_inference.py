@@ -0,0 +1,172 @@
+# risk_inference.py
+
+
+import os
+import sys
+import threading
+
+import joblib
+import pandas as pd
+
+from nav_live_merge import scheme_code_index
+from recommend_logic import asset_class_map, market_cap_map
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))  # repo root
+from pipeline.classification import classify_schemes
+from pipeline.compact_forest import CompactForest
+from pipeline.nav_features import latest_features
+from pipeline.outliers import PHASE3_TRANSFORMS, apply_transforms, load_bounds, transformed_name
+from pipeline.risk_model import RISK_FEATURES, RISK_MAP
+
+
+RISK_MODEL_PATH = "random_forest_risk_classifier_final.pkl"
+# Flat export of the same forest (pipeline/compact_forest.py), preferred when present
+RISK_MODEL_COMPACT_PATH = "random_forest_risk_classifier_final_compact"
+# The compact forest only predicts faster on small batches; larger ones use the pickle when it is there
+COMPACT_MAX_ROWS = int(os.getenv("RISK_COMPACT_MAX_ROWS", "500"))
+WINSORIZE_BOUNDS_PATH = "phase3_winsorize_bounds.json"
+LIVE_NAV_HISTORY_PATH = "live_nav_history.csv"
+# Enough daily history for the 2-year CAGR and the yearly STD
+LIVE_HISTORY_DAYS = int(os.getenv("LIVE_HISTORY_DAYS", "800"))
+# A scheme is scored once it has about a month of live NAVs
+MIN_HISTORY_ROWS = int(os.getenv("LIVE_MIN_HISTORY_ROWS", "21"))
+
+HISTORY_COLUMNS = ["SchemeCode", "Scheme", "Category", "NAV", "Date"]
+RISK_TRANSFORMS = [
+    (column, kind) for column, kind in PHASE3_TRANSFORMS if transformed_name(column, kind) in RISK_FEATURES
+]
+
+
+class LiveRiskScorer:
+    """
+    Risk levels for schemes that are in live NAVAll.txt but not in the phase 5
+    feature file. The phase 4-5 random forest (its memory-mapped compact
+    export when there is one) and the phase 3 winsorization bounds are
+    loaded once at startup; batches over COMPACT_MAX_ROWS schemes are
+    predicted with the pickled forest instead, loaded on first use. Each NAV refresh appends the live-only
+    schemes' NAVs to a persisted daily history and re-scores all of them in
+    one batch: phase 2 features (pipeline.nav_features), phase 3 transforms
+    with the saved bounds, then model.predict. Features a young scheme cannot
+    have yet are filled with the median of the offline universe.
+    Scored schemes keep their mapped SchemeID, or -SchemeCode when AMFI's
+    code has no SchemeID at all.
+    """
+
+    def __init__(self, model_path=RISK_MODEL_PATH, compact_path=RISK_MODEL_COMPACT_PATH,
+                 bounds_path=WINSORIZE_BOUNDS_PATH, history_path=LIVE_NAV_HISTORY_PATH):
+        self.model_path = model_path
+        self.compact_path = compact_path
+        self.bounds_path = bounds_path
+        self.history_path = history_path
+        self.version = 0
+        self._model = None
+        self._pickled_model = None
+        self._bounds = None
+        self._history = None
+        self._scored = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            if os.path.isdir(self.compact_path):
+                self._model = CompactForest.load(self.compact_path)
+            else:
+                self._model = joblib.load(self.model_path)
+            self._bounds = load_bounds(self.bounds_path)
+        except (OSError, ValueError, KeyError) as e:
+            self._model = None
+            print("⚠️ Live risk scoring disabled, model artifacts not loaded:", e)
+            return False
+
+        if os.path.exists(self.history_path):
+            self._history = pd.read_csv(self.history_path, parse_dates=["Date"])
+        else:
+            self._history = pd.DataFrame(columns=HISTORY_COLUMNS)
+        print(f"✅ Risk model loaded: {type(self._model).__name__}, "
+              f"{self._history['SchemeCode'].nunique()} live-only schemes in history.")
+        return True
+
+    def scored(self):
+        """Latest scored rows for live-only schemes (read-only), or None."""
+        return self._scored
+
+    def _model_for(self, n_rows):
+        """The compact forest for small batches, the pickled one (when present) for larger ones."""
+        if not isinstance(self._model, CompactForest) or n_rows <= COMPACT_MAX_ROWS:
+            return self._model
+        if self._pickled_model is None and os.path.exists(self.model_path):
+            try:
+                self._pickled_model = joblib.load(self.model_path)
+            except (OSError, ValueError, KeyError) as e:
+                print("⚠️ Pickled risk model not loaded, using the compact forest:", e)
+        return self._pickled_model if self._pickled_model is not None else self._model
+
+    def _live_only(self, live_nav_df, feature_df):
+        """Live rows whose scheme has no row in the feature file, with the SchemeID to use."""
+        pairs = scheme_code_index.update(live_nav_df)
+        code_to_id = pairs.drop_duplicates("SchemeCode").set_index("SchemeCode")["SchemeID"]
+        scheme_ids = live_nav_df["SchemeCode"].map(code_to_id)
+        live_only = ~scheme_ids.isin(feature_df["SchemeID"])
+        scheme_ids = scheme_ids.fillna(-live_nav_df["SchemeCode"]).astype("int64")
+        return live_nav_df.loc[live_only, HISTORY_COLUMNS].assign(SchemeID=scheme_ids[live_only])
+
+    def _append_history(self, live_rows):
+        history = pd.concat([self._history, live_rows[HISTORY_COLUMNS]], ignore_index=True)
+        history["Date"] = pd.to_datetime(history["Date"])
+        history = history.drop_duplicates(["SchemeCode", "Date"], keep="last")
+        history = history[history["Date"] >= history["Date"].max() - pd.Timedelta(days=LIVE_HISTORY_DAYS)]
+        history = history[history["SchemeCode"].isin(live_rows["SchemeCode"])]
+
+        tmp_path = f"{self.history_path}.tmp"
+        history.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.history_path)
+        return history.reset_index(drop=True)
+
+    def _score(self, history, scheme_ids, feature_df):
+        history = history.assign(SchemeID=history["SchemeCode"].map(scheme_ids))
+        counts = history.groupby("SchemeID")["NAV"].count()
+        history = history[history["SchemeID"].isin(counts.index[counts >= MIN_HISTORY_ROWS])]
+        if history.empty:
+            return None
+
+        # 📈 Phase 2 features → phase 3 transforms with the saved bounds
+        features = latest_features(history)
+        features = apply_transforms(features, self._bounds, RISK_TRANSFORMS)
+        X = features[RISK_FEATURES].fillna(feature_df[RISK_FEATURES].median())
+        model = self._model_for(len(X))
+        columns = getattr(model, "feature_names_in_", RISK_FEATURES)
+        features["Cluster_Label"] = model.predict(X[list(columns)])
+        features["Risk_Level"] = features["Cluster_Label"].map(RISK_MAP)
+
+        # 🏷️ Classes from the NAVAll.txt category, label-encoded like phase 3
+        latest = history.sort_values("Date").groupby("SchemeID").tail(1).set_index("SchemeID")
+        features["Scheme"] = features["SchemeID"].map(latest["Scheme"])
+        categories = latest.set_index("Scheme")["Category"].dropna()
+        categories = categories[~categories.index.duplicated()]
+        asset_class, market_cap = classify_schemes(features["Scheme"], categories=categories)
+        features["Balanced_AssetClass"] = asset_class.astype(str).str.lower().map(asset_class_map).to_numpy()
+        features["Balanced_MarketCap"] = market_cap.astype(str).str.lower().map(market_cap_map).to_numpy()
+
+        return features.reindex(columns=feature_df.columns.union(features.columns, sort=False))
+
+    def update(self, live_nav_df, feature_df):
+        """Appends the live-only NAVs to the history and re-scores those schemes in one batch."""
+        if self._model is None or live_nav_df is None or live_nav_df.empty:
+            return self._scored
+        with self._lock:
+            live_rows = self._live_only(live_nav_df, feature_df)
+            history = self._append_history(live_rows)
+            scheme_ids = live_rows.drop_duplicates("SchemeCode").set_index("SchemeCode")["SchemeID"]
+            scored = self._score(history, scheme_ids, feature_df)
+
+            self._history = history
+            self._scored = scored
+            self.version += 1
+
+        n_scored = 0 if scored is None else len(scored)
+        print(f"✅ Live risk scoring: {live_rows['SchemeCode'].nunique()} live-only schemes, "
+              f"{n_scored} scored (version {self.version}).")
+        return scored
+
+
+live_risk_scorer = LiveRiskScorer()
@@ -0,0 +1,57 @@
+# scheme_metadata.py
+
+
+import os
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))  # repo root
+from pipeline.snapshot import read_table
+
+
+SCHEME_MAPPING_PATH = "AFTER_PHASE_2_with_balance_FINAL.csv"
+
+
+class SchemeMetadata:
+    """
+    Process-wide SchemeID → scheme name index, read lazily from the phase 2
+    mapping file the first time it is needed and shared by the recommenders,
+    the live NAV merge and the /schemes endpoint.
+    """
+
+    def __init__(self, path=SCHEME_MAPPING_PATH):
+        self.path = path
+        self._pairs = None
+        self._names = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._pairs is not None:
+            return
+        with self._lock:
+            if self._pairs is not None:
+                return
+            try:
+                pairs = read_table(self.path, columns=["SchemeID", "Scheme"]).dropna()
+            except Exception as e:
+                raise RuntimeError(f"❌ Failed to load mapping file: {e}")
+            pairs["SchemeID"] = pairs["SchemeID"].astype("int64")
+            pairs["Scheme"] = pairs["Scheme"].astype(str).str.strip()
+            pairs = pairs.drop_duplicates().reset_index(drop=True)
+
+            self._names = pairs.set_index("SchemeID")["Scheme"].to_dict()
+            self._pairs = pairs
+            print(f"✅ Scheme metadata loaded: {len(self._names)} schemes.")
+
+    def names(self):
+        """Returns the SchemeID → display name dictionary."""
+        self._ensure_loaded()
+        return self._names
+
+    def pairs(self):
+        """Returns the distinct (SchemeID, Scheme) pairs. Treat as read-only."""
+        self._ensure_loaded()
+        return self._pairs
+
+
+scheme_metadata = SchemeMetadata()
@@ -5,8 +5,13 @@ import matplotlib.pyplot as plt
 import seaborn as sns 
 import re 
 from scipy.stats import zscore 
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root, for the shared pipeline package
+from pipeline.paths import data_path
+from pipeline.snapshot import write_snapshot
 #%% Load Dataset 
-file_path = r"C:\Users\prana\Downloads\Mutual_funds\all-funds-nav.csv" 
+file_path = data_path("all_funds_nav", r"C:\Users\prana\Downloads\Mutual_funds\all-funds-nav.csv") 
 # Load data with error handling for bad lines 
 df = pd.read_csv(file_path, low_memory=False, encoding="utf-8", on_bad_lines='skip') 
 # #%% 
@@ -98,8 +103,9 @@ plt.title("Boxplot of NAV values")
 plt.show()
 # %%
 # Save the cleaned data to a new CSV file
-output_path = r"C:\Users\prana\Downloads\Mutual_funds\after_phase_1.csv"
+output_path = data_path("after_phase_1", r"C:\Users\prana\Downloads\Mutual_funds\after_phase_1.csv")
 df_cleaned.to_csv(output_path, index=False)
+write_snapshot(df_cleaned, output_path)
 
 print(f"✅ Cleaned data saved to: {output_path}")
 
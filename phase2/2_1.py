@@ -1,87 +1,31 @@
 #%%
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import zscore
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root, for the shared pipeline package
+from pipeline.paths import data_path
+from pipeline.snapshot import read_table, write_snapshot
+from pipeline.classification import assign_balanced_labels, classify_schemes, load_scheme_categories
 #%% Load Dataset 
-file_path = r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2.csv" 
+file_path = data_path("after_phase_2", r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2.csv") 
 # Load data  with error handling for bad lines 
-df = pd.read_csv(file_path, low_memory=False, encoding="utf-8", on_bad_lines='skip') 
+df = read_table(file_path, low_memory=False, encoding="utf-8", on_bad_lines='skip') 
 # %%
-import re
-#  Enhanced Asset Class Classification
-def classify_asset_class(scheme_name):
-    scheme_name = scheme_name.lower().strip()
-    #  Liquid Class (Enhanced Patterns)
-    if re.search(r'\bovernight\b|\bliquid\b|\bcash\s*management\b|\bmoney\s*market\b|\btreasury\b|\bcall\s*money\b|\bfloater\b|\bshort\s*duration\b|\bsavings\b|\bultra\s*short\b|\barbitrage\b|\breserve\b|\binstant\b|\bliquid\s*fund\b', scheme_name):
-        return "Liquid"
-    #  Equity Class (Expanded Coverage)
-    elif re.search(r'\bequity\b|\bstock\b|\blarge\s*cap\b|\bmid\s*cap\b|\bsmall\s*cap\b|\bflexi\s*cap\b|\bmulti\s*cap\b|\bvalue\b|\bcontra\b|\bthematic\b|\bdiversified\b|\bfocused\b|\bgrowth\b|\bbluechip\b|\btop\s*[0-9]+\b|\balpha\b|\bquant\b|\bstrategy\b|\btheme\b', scheme_name):
-        return "Equity"
-    #  Debt Class (Additional Cases Handled)
-    elif re.search(r'\bdebt\b|\bincome\b|\bfmp\b|\bbond\b|\bgilt\b|\bcorporate\s*bonds\b|\bsovereign\b|\bduration\b|\btarget\s*maturity\b|\bdynamic\s*bond\b|\bfixed\s*maturity\b|\bcredit\s*risk\b|\byield\b|\bbanking\s*bonds\b|\bshort\s*term\b', scheme_name):
-        return "Debt"
-    #  Hybrid Class (More Conservative Matches)
-    elif re.search(r'\bhybrid\b|\bbalanced\b|\basset\s*allocation\b|\bconservative\b|\baggressive\b|\barbitrage\b|\bbalanced\s*advantage\b|\bequity\s*savings\b|\bmip\b|\bcombo\b|\btactical\s*allocation\b|\bsolution\b|\ballocation\b', scheme_name):
-        return "Hybrid"
-    #  Index/ETF Class (Broader ETF Matches)
-    elif re.search(r'\betf\b|\bindex\b|\bnifty\b|\bsensex\b|\bbenchmark\b|\bpassive\b|\btracking\s*fund\b|\bnasdaq\b|\bsp500\b|\bdow\s*jones\b|\bglobal\b|\bintl\b|\bindia\b|\bworld\b', scheme_name):
-        return "Index/ETF"
-    #  Gold/Commodity Class
-    elif re.search(r'\bgold\b|\bsilver\b|\bcommodity\b|\bmetals\b|\bprecious\s*metals\b|\breal\s*assets\b|\bnatural\s*resources\b|\bplatinum\b', scheme_name):
-        return "Gold"
-    #  Specialized Class (Enhanced Matching)
-    elif re.search(r'\bulip\b|\bunit\s*linked\b|\bchild\s*plan\b|\belss\b|\bretirement\b|\bpension\b|\btax\b|\bwealth\b|\binsurance\b|\bgovernment\s*scheme\b|\bsocial\s*impact\b|\bethical\s*investing\b|\binnovation\b', scheme_name):
-        return "Specialized"
-    #  Reduce "Other" but don't eliminate completely
-    if re.search(r'\bplan\b|\bsolution\b|\bcapital\b|\ballocation\b|\bportfolio\b|\bfund\b|\bscheme\b|\bpolicy\b', scheme_name):
-        return "Hybrid"
-    #  Still allow some fallback to "Other"
-    return "Other"
-#  Enhanced Market Cap Classification
-def classify_market_cap(scheme_name, asset_class):
-    scheme_name = scheme_name.lower().strip()
-    #  Equity Classification
-    if asset_class == "Equity":
-        if re.search(r'\blarge\s*cap\b|\bbluechip\b|\bnifty\s*50\b|\bsensex\b|\btop\s*100\b|\bfrontline\b|\bbenchmark\b', scheme_name):
-            return "Large Cap"
-        elif re.search(r'\bmid\s*cap\b|\bmidcap\b|\bmedium\s*cap\b|\bmid\s*tier\b|\btop\s*150\b', scheme_name):
-            return "Mid Cap"
-        elif re.search(r'\bsmall\s*cap\b|\bsmallcap\b|\bemerging\b|\btop\s*250\b|\bsmid\b|\bgrowth\b|\bsmall\s*tier\b', scheme_name):
-            return "Small Cap"
-        elif re.search(r'\bmulti\s*cap\b|\bflexi\s*cap\b|\bdiversified\b|\bbalanced\s*equity\b', scheme_name):
-            return "Multi Cap"
-        elif re.search(r'\bfocused\b|\bvalue\b|\bcontra\b|\besg\b|\btheme\b|\bstrategy\b', scheme_name):
-            return "Focused/Value"
-        elif re.search(r'\bsectoral\b|\bthematic\b|\bbanking\b|\bpharma\b|\btechnology\b|\binfrastructure\b|\benergy\b|\bauto\b', scheme_name):
-            return "Sectoral/Thematic"
-        return "Multi Cap"  # Fallback to Multi Cap for unmatched equity
-    #  Debt & Hybrid Schemes
-    elif asset_class in ["Debt", "Hybrid"]:
-        if re.search(r'\bduration\b|\bgilt\b|\bbond\b|\bcredit\b|\byield\b|\bcorporate\b|\bdynamic\b|\btactical\b|\bsovereign\b', scheme_name):
-            return "Sectoral/Thematic"
-        elif re.search(r'\bliquid\b|\bovernight\b|\bshort\s*duration\b|\bmoney\s*market\b', scheme_name):
-            return "Large Cap"
-        return "Focused/Value"
-    #  Index/ETF Schemes
-    elif asset_class == "Index/ETF":
-        if re.search(r'\bnifty\s*50\b|\bsensex\b|\blarge\s*cap\b|\btop\s*50\b', scheme_name):
-            return "Large Cap"
-        elif re.search(r'\bmid\s*cap\b|\bsmall\s*cap\b|\btop\s*250\b|\bemerging\b', scheme_name):
-            return "Mid/Small Cap"
-        return "Sectoral/Thematic"
-    #  Gold & Specialized
-    elif asset_class == "Gold":
-        return "Sectoral/Thematic"
-    elif asset_class == "Specialized":
-        return "Focused/Value"
-    #  Keep some "Other" for unknowns
-    return "Other" if "fund" not in scheme_name else "Multi Cap"
+#  Enhanced Asset Class / Market Cap Classification (rules in pipeline/classification.py)
+# SEBI categories from NAVAll.txt (saved by the backend's live NAV fetcher) come
+# first; other names fall back to the regex rules. Each distinct scheme name is
+# classified once; regex results are cached in class_cache_path so re-runs only
+# classify newly seen names.
+categories_path = data_path("scheme_categories", r"C:\Users\prana\Downloads\Mutual_funds\amfi_scheme_categories.csv")
+class_cache_path = data_path("scheme_classes", r"C:\Users\prana\Downloads\Mutual_funds\scheme_classes.csv")
+scheme_categories = load_scheme_categories(categories_path)
 #  Apply Enhanced Classifications
 df['Scheme'] = df['Scheme'].str.strip().str.lower().fillna("")
-df['AssetClass'] = df['Scheme'].apply(classify_asset_class)
-df['MarketCap'] = df.apply(lambda row: classify_market_cap(row['Scheme'], row['AssetClass']), axis=1)
+df['AssetClass'], df['MarketCap'] = classify_schemes(df['Scheme'], cache_path=class_cache_path,
+                                                     categories=scheme_categories)
 #  Final Optimized Distribution
 print(" Optimized Market Cap Distribution:\n", df['MarketCap'].value_counts())
 print(" Optimized Asset Class Distribution:\n", df['AssetClass'].value_counts())
@@ -185,20 +129,17 @@ plt.title("Balanced Asset Class Distribution")
 plt.show()
 
 # %%
-# Assign Balanced AssetClass Labels
-df['Balanced_AssetClass'] = np.nan
-for cls, count in asset_class_balanced[['AssetClass', 'BalancedCount']].values:
-    matching_rows = df[df['AssetClass'] == cls]
-    sampled_rows = matching_rows.sample(n=min(count, len(matching_rows)), random_state=42)
-    df.loc[sampled_rows.index, 'Balanced_AssetClass'] = cls
-
-# Assign Balanced MarketCap Labels
-df['Balanced_MarketCap'] = np.nan
-for cls, count in market_cap_balanced[['MarketCap', 'BalancedCount']].values:
-    matching_rows = df[df['MarketCap'] == cls]
-    sampled_rows = matching_rows.sample(n=min(count, len(matching_rows)), random_state=42)
-    df.loc[sampled_rows.index, 'Balanced_MarketCap'] = cls
+# Assign Balanced AssetClass / MarketCap Labels
+# A random subset of each class, up to its BalancedCount, keeps its label (the same
+# seed gives the same labels; key='SchemeID' keeps or drops whole schemes instead)
+asset_class_targets = dict(asset_class_balanced[['AssetClass', 'BalancedCount']].values)
+market_cap_targets = dict(market_cap_balanced[['MarketCap', 'BalancedCount']].values)
+df['Balanced_AssetClass'] = assign_balanced_labels(df, 'AssetClass', asset_class_targets, seed=42)
+df['Balanced_MarketCap'] = assign_balanced_labels(df, 'MarketCap', market_cap_targets, seed=42)
+# %%
+# Save the categorized data (read by 2_2.py)
+output_path = data_path("after_phase_2_categorized", r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2_with_categorization.csv")
+df.to_csv(output_path, index=False)
+write_snapshot(df, output_path)
 
-# Optional: Convert to category type
-df['Balanced_AssetClass'] = df['Balanced_AssetClass'].astype('category')
-df['Balanced_MarketCap'] = df['Balanced_MarketCap'].astype('category')
+print(f"✅ Categorized data saved to: {output_path}")
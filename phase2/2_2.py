@@ -1,17 +1,22 @@
 # %%
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import zscore
 import re
 from sklearn.utils import resample
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root, for the shared pipeline package
+from pipeline.paths import data_path
+from pipeline.snapshot import read_table, write_snapshot
+from pipeline.classification import assign_balanced_labels
 
 # %% Load Dataset
-file_path = r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2_with_categorization.csv"
+file_path = data_path("after_phase_2_categorized", r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2_with_categorization.csv")
 
 # Load data with error handling
-df = pd.read_csv(file_path, low_memory=False, encoding="utf-8", on_bad_lines='skip')
+df = read_table(file_path, low_memory=False, encoding="utf-8", on_bad_lines='skip')
 #%% Final Optimized Distribution
 print(" Optimized Market Cap Distribution:\n", df['MarketCap'].value_counts())
 print(" Optimized Asset Class Distribution:\n", df['AssetClass'].value_counts())
@@ -115,23 +120,13 @@ plt.title("Balanced Asset Class Distribution")
 plt.show()
 
 # %%
-# Assign Balanced AssetClass Labels
-df['Balanced_AssetClass'] = np.nan
-for cls, count in asset_class_balanced[['AssetClass', 'BalancedCount']].values:
-    matching_rows = df[df['AssetClass'] == cls]
-    sampled_rows = matching_rows.sample(n=min(count, len(matching_rows)), random_state=42)
-    df.loc[sampled_rows.index, 'Balanced_AssetClass'] = cls
-
-# Assign Balanced MarketCap Labels
-df['Balanced_MarketCap'] = np.nan
-for cls, count in market_cap_balanced[['MarketCap', 'BalancedCount']].values:
-    matching_rows = df[df['MarketCap'] == cls]
-    sampled_rows = matching_rows.sample(n=min(count, len(matching_rows)), random_state=42)
-    df.loc[sampled_rows.index, 'Balanced_MarketCap'] = cls
-
-# Optional: Convert to category type
-df['Balanced_AssetClass'] = df['Balanced_AssetClass'].astype('category')
-df['Balanced_MarketCap'] = df['Balanced_MarketCap'].astype('category')
+# Assign Balanced AssetClass / MarketCap Labels
+# A random subset of each class, up to its BalancedCount, keeps its label (the same
+# seed gives the same labels; key='SchemeID' keeps or drops whole schemes instead)
+asset_class_targets = dict(asset_class_balanced[['AssetClass', 'BalancedCount']].values)
+market_cap_targets = dict(market_cap_balanced[['MarketCap', 'BalancedCount']].values)
+df['Balanced_AssetClass'] = assign_balanced_labels(df, 'AssetClass', asset_class_targets, seed=42)
+df['Balanced_MarketCap'] = assign_balanced_labels(df, 'MarketCap', market_cap_targets, seed=42)
 # %%
 df.isnull().sum()
 # %%
@@ -141,8 +136,9 @@ df['Balanced_AssetClass'].value_counts()
 # %%
 df['Balanced_MarketCap'].value_counts()
 # %%
-output_path = r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2_with_balance.csv"
+output_path = data_path("after_phase_2_balanced", r"C:\Users\prana\Downloads\Mutual_funds\after_phase_2_with_balance.csv")
 df.to_csv(output_path, index=False)
+write_snapshot(df, output_path)
 
 print(f"✅ Cleaned data saved to: {output_path}")
 # %%
@@ -2,17 +2,21 @@ import pandas as pd
 import numpy as np 
 import matplotlib.pyplot as plt 
 import seaborn as sns 
-from sklearn.preprocessing import StandardScaler 
-from sklearn.decomposition import PCA 
-from sklearn.cluster import KMeans 
 from sklearn.metrics import silhouette_score, classification_report, confusion_matrix 
 from sklearn.model_selection import train_test_split 
 from sklearn.ensemble import RandomForestClassifier 
 import joblib 
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root, for the shared pipeline package
+from pipeline.paths import data_path
+from pipeline.snapshot import read_table, write_snapshot
+from pipeline.compact_forest import export_forest
+from pipeline.risk_model import DEFAULT_CLUSTER_LEVEL, RISK_FEATURES, RISK_MAP, aggregate_features, broadcast_labels, fit_risk_clusters, scheme_purity
  
 #%% Step 1: Load the already scaled dataset 
-file_path = r"/content/drive/Shareddrives/MF_57/Mutual_funds/AFTER_PHASE_3(transformation).csv" 
-df = pd.read_csv(file_path, low_memory=False, encoding="utf-8", 
+file_path = data_path("after_phase_3", r"/content/drive/Shareddrives/MF_57/Mutual_funds/AFTER_PHASE_3(transformation).csv") 
+df = read_table(file_path, low_memory=False, encoding="utf-8", 
 on_bad_lines='skip') 
  
 df.shape 
@@ -38,28 +42,23 @@ for col in ['Sharpe_Ratio_log_normalize', 'Sortino_Ratio_log_normalize']:
     df[col] = df[col].fillna(df[col].median()) 
  
 #%% Step 4: Define Set 5 Features (Pure Volatility + Downside) 
-set5_features = [ 
-    'Yearly_Return_winsorized', 
-    'Monthly_Return_winsorized','Yearly_STD_winsorized', 
-    'Monthly_STD_winsorized', 
-    'Max_Drawdown_winsorized', 
-    'Sharpe_Ratio_log_normalize','CAGR_1Y_winsorized' 
-] 
+set5_features = RISK_FEATURES 
  
-# Prepare features 
-X = df[set5_features].dropna() 
- 
-#%% Step 5: Standardize 
-scaler = StandardScaler() 
-X_scaled = scaler.fit_transform(X) 
+# Clustering unit: "row" (every daily row, the default), or opt-in "scheme" (one mean 
+# feature vector per SchemeID) / "scheme_month"; "minibatch" fits MiniBatchKMeans instead of KMeans. 
+# Cluster ids map straight to RISK_MAP, so another level can permute the risk levels. 
+CLUSTER_LEVEL = DEFAULT_CLUSTER_LEVEL 
+CLUSTER_ALGORITHM = "kmeans" 
  
-#%% Step 6: Apply PCA 
-pca = PCA(n_components=2, random_state=42) 
-X_pca = pca.fit_transform(X_scaled) 
+# Prepare features 
+X, unit_ids = aggregate_features(df, set5_features, level=CLUSTER_LEVEL) 
+print(f"📌 Clustering {len(X)} {CLUSTER_LEVEL} feature vectors from {len(unit_ids)} rows") 
  
-#%% Step 7: Apply KMeans on PCA-transformed data 
-kmeans = KMeans(n_clusters=3, random_state=42, n_init=10) 
-cluster_labels = kmeans.fit_predict(X_pca) 
+#%% Steps 5-7: Standardize, apply PCA, apply KMeans on PCA-transformed data 
+# (when the history no longer fits in memory, fit these out of core instead: 
+#  python -m pipeline.streaming_fit "AFTER_PHASE_3(transformation).csv" --out-dir <model dir>) 
+scaler, pca, kmeans, X_pca, cluster_labels = fit_risk_clusters( 
+    X, n_clusters=3, n_components=2, algorithm=CLUSTER_ALGORITHM, random_state=42) 
  
 #%% Step 8: Print Inertia 
 final_inertia = kmeans.inertia_ 
@@ -85,22 +84,15 @@ kmeans.inertia_
  
 #%% Step 10: Attach Cluster Labels to Original Data 
 df_clustered = df.copy() 
-df_clustered = df_clustered.loc[X.index]  # Ensure same rows as X 
-df_clustered['Cluster_Label'] = cluster_labels 
+df_clustered = df_clustered.loc[unit_ids.index]  # Ensure same rows as the clustered units 
+df_clustered['Cluster_Label'] = broadcast_labels(cluster_labels, unit_ids) 
+print(f"📌 Schemes in a single cluster: {scheme_purity(df_clustered['SchemeID'], df_clustered['Cluster_Label']):.1%}") 
  
 # Optional: Map cluster numbers to Risk Levels (based on domain or PCA space) 
-risk_map = { 
-    0: 'Low',     # You can adjust based on visualization understanding 
-    1: 'Medium', 
-    2: 'High' 
-} 
+risk_map = RISK_MAP  # You can adjust based on visualization understanding 
 df_clustered['Risk_Level'] = df_clustered['Cluster_Label'].map(risk_map) 
  
 #%% Step 11: Train Random Forest Classifier 
-from sklearn.ensemble import RandomForestClassifier 
-from sklearn.model_selection import train_test_split 
-from sklearn.metrics import classification_report 
- 
 # Define input and target 
 X_rf = df_clustered[set5_features]  # original features, not PCA-transformed 
 y_rf = df_clustered['Cluster_Label'] 
@@ -177,39 +169,39 @@ risk_counts = df_clustered['Risk_Level'].value_counts()
 print("\n📊Number of records in each Risk Level:") 
 print(risk_counts) 
  
-import seaborn as sns 
-import matplotlib.pyplot as plt 
- 
 sns.countplot(data=df_clustered, x='Cluster_Label', palette='viridis') 
 plt.title("Distribution of Records Across Clusters") 
 plt.xlabel("Cluster Label") 
 plt.ylabel("Number of Records") 
 plt.show() 
  
-import joblib 
- 
 # 1. Save updated clustered DataFrame with new name 
-df_clustered.to_csv("/content/drive/Shareddrives/MF_57/Mutual_funds/df_clustered_phase_5_final.csv", index=False) 
+df_clustered.to_csv(data_path("clustered", "/content/drive/Shareddrives/MF_57/Mutual_funds/df_clustered_phase_5_final.csv"), index=False) 
 print("✅New clustered DataFrame saved as df_clustered_phase_5_final.csv") 
  
 # 2. Save new Random Forest model 
-joblib.dump(rf_classifier, "/content/drive/Shareddrives/MF_57/Mutual_funds/random_forest_risk_classifier_final.pkl") 
+joblib.dump(rf_classifier, data_path("risk_model", "/content/drive/Shareddrives/MF_57/Mutual_funds/random_forest_risk_classifier_final.pkl")) 
 print("✅New Random Forest model saved as random_forest_risk_classifier_final.pkl") 
  
+# 2b. Compact, memory-mapped form of the Random Forest (loaded by the backend when present) 
+export_forest(rf_classifier, data_path("risk_model_compact", "/content/drive/Shareddrives/MF_57/Mutual_funds/random_forest_risk_classifier_final_compact")) 
+ 
 # 3. Save new Scaler 
-joblib.dump(scaler, "/content/drive/Shareddrives/MF_57/Mutual_funds/scaler_for_rf_model_final.pkl") 
+joblib.dump(scaler, data_path("scaler", "/content/drive/Shareddrives/MF_57/Mutual_funds/scaler_for_rf_model_final.pkl")) 
 print("✅New scaler saved as scaler_for_rf_model_final.pkl") 
  
 # 4. Save new PCA transformer 
-joblib.dump(pca, "/content/drive/Shareddrives/MF_57/Mutual_funds/PCA_transformer_final.pkl") 
+joblib.dump(pca, data_path("pca", "/content/drive/Shareddrives/MF_57/Mutual_funds/PCA_transformer_final.pkl")) 
 print("✅New PCA transformer saved as PCA_transformer_final.pkl") 
  
 # 5. Save new KMeans model 
 joblib.dump(kmeans, 
-"/content/drive/Shareddrives/MF_57/Mutual_funds/KMeans_model_final.pkl") 
+data_path("kmeans", "/content/drive/Shareddrives/MF_57/Mutual_funds/KMeans_model_final.pkl")) 
 print("✅New KMeans model saved as KMeans_model_final.pkl") 
  
 # Save the full DataFrame after clustering and risk labeling 
-df_clustered.to_csv("/content/drive/Shareddrives/MF_57/Mutual_funds/phase5_processed_funds_data_final.csv", index=False) 
+phase5_path = data_path("phase5", "/content/drive/Shareddrives/MF_57/Mutual_funds/phase5_processed_funds_data_final.csv") 
+df_clustered.to_csv(phase5_path, index=False) 
+write_snapshot(df_clustered, phase5_path) 
  
 print("✅Phase 5 processed data saved as 'phase5_processed_funds_data_final.csv'")
@@ -2,13 +2,17 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root, for the shared pipeline package
+from pipeline.snapshot import read_table
 #%%
 # ✅ Load Phase 5 processed dataset
 processed_path = r"C:\Users\nidhi\Desktop\Int project\phase5_processed_funds_data_final.csv"
 original_path = r"C:\Users\nidhi\Desktop\Int project\AFTER_PHASE_2_with_balance_FINAL.csv"
 #%%
-df_processed = pd.read_csv(processed_path, parse_dates=["Date"])
-df_original = pd.read_csv(original_path, parse_dates=["Date"])
+df_processed = read_table(processed_path, parse_dates=["Date"])
+df_original = read_table(original_path, parse_dates=["Date"])
 
 #%%
 df_processed.isnull().sum()
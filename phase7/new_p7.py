@@ -1,5 +1,9 @@
 import streamlit as st
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root, for the shared pipeline package
+from pipeline.snapshot import read_table
 from new_p6 import recommend_for_existing_investor, recommend_for_new_investor
 
 st.set_page_config(page_title="Mutual Fund Recommender", layout="centered")
@@ -9,8 +13,8 @@ def load_data():
     path = r"C:\Users\nidhi\Desktop\Int project\phase5_processed_funds_data_final.csv"
     original_path = r"C:\Users\nidhi\Desktop\Int project\AFTER_PHASE_2_with_balance_FINAL.csv"
 
-    df = pd.read_csv(path, parse_dates=["Date"])
-    df_original = pd.read_csv(original_path, parse_dates=["Date"])
+    df = read_table(path, parse_dates=["Date"])
+    df_original = read_table(original_path, columns=["SchemeID", "Date", "Scheme"], parse_dates=["Date"])
     scheme_map = df_original[['SchemeID', 'Date', 'Scheme']]
     df = pd.merge(df.drop(columns=["Scheme"]), scheme_map, on=["SchemeID", "Date"], how="left")
 
@@ -0,0 +1 @@
+"""Shared building blocks for the offline mutual fund pipeline (phases 1-5)."""
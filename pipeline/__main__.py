@@ -0,0 +1,7 @@
+"""python -m pipeline: runs the phase 1-5 stages (see pipeline/runner.py)."""
+
+from pipeline.runner import main
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Asset class and market cap classification of scheme names.
+
+The primary source is the SEBI category AMFI publishes for every scheme in
+the NAVAll.txt section headers (saved by the backend as
+amfi_scheme_categories.csv). Names without a known category fall back to the
+regex rules phase2/2_1.py has always used, compiled once. Each distinct name
+is classified a single time; regex results are kept in a persisted
+name -> (AssetClass, MarketCap) table so re-runs only classify names that
+have not been seen before, and everything is broadcast back to the rows
+through a categorical code map.
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------
+# Rules
+# ------------------------
+ASSET_CLASS_RULES = [
+    #  Liquid Class (Enhanced Patterns)
+    ("Liquid", r'\bovernight\b|\bliquid\b|\bcash\s*management\b|\bmoney\s*market\b|\btreasury\b|\bcall\s*money\b|\bfloater\b|\bshort\s*duration\b|\bsavings\b|\bultra\s*short\b|\barbitrage\b|\breserve\b|\binstant\b|\bliquid\s*fund\b'),
+    #  Equity Class (Expanded Coverage)
+    ("Equity", r'\bequity\b|\bstock\b|\blarge\s*cap\b|\bmid\s*cap\b|\bsmall\s*cap\b|\bflexi\s*cap\b|\bmulti\s*cap\b|\bvalue\b|\bcontra\b|\bthematic\b|\bdiversified\b|\bfocused\b|\bgrowth\b|\bbluechip\b|\btop\s*[0-9]+\b|\balpha\b|\bquant\b|\bstrategy\b|\btheme\b'),
+    #  Debt Class (Additional Cases Handled)
+    ("Debt", r'\bdebt\b|\bincome\b|\bfmp\b|\bbond\b|\bgilt\b|\bcorporate\s*bonds\b|\bsovereign\b|\bduration\b|\btarget\s*maturity\b|\bdynamic\s*bond\b|\bfixed\s*maturity\b|\bcredit\s*risk\b|\byield\b|\bbanking\s*bonds\b|\bshort\s*term\b'),
+    #  Hybrid Class (More Conservative Matches)
+    ("Hybrid", r'\bhybrid\b|\bbalanced\b|\basset\s*allocation\b|\bconservative\b|\baggressive\b|\barbitrage\b|\bbalanced\s*advantage\b|\bequity\s*savings\b|\bmip\b|\bcombo\b|\btactical\s*allocation\b|\bsolution\b|\ballocation\b'),
+    #  Index/ETF Class (Broader ETF Matches)
+    ("Index/ETF", r'\betf\b|\bindex\b|\bnifty\b|\bsensex\b|\bbenchmark\b|\bpassive\b|\btracking\s*fund\b|\bnasdaq\b|\bsp500\b|\bdow\s*jones\b|\bglobal\b|\bintl\b|\bindia\b|\bworld\b'),
+    #  Gold/Commodity Class
+    ("Gold", r'\bgold\b|\bsilver\b|\bcommodity\b|\bmetals\b|\bprecious\s*metals\b|\breal\s*assets\b|\bnatural\s*resources\b|\bplatinum\b'),
+    #  Specialized Class (Enhanced Matching)
+    ("Specialized", r'\bulip\b|\bunit\s*linked\b|\bchild\s*plan\b|\belss\b|\bretirement\b|\bpension\b|\btax\b|\bwealth\b|\binsurance\b|\bgovernment\s*scheme\b|\bsocial\s*impact\b|\bethical\s*investing\b|\binnovation\b'),
+    #  Reduce "Other" but don't eliminate completely
+    ("Hybrid", r'\bplan\b|\bsolution\b|\bcapital\b|\ballocation\b|\bportfolio\b|\bfund\b|\bscheme\b|\bpolicy\b'),
+]
+
+# asset class -> ordered (market cap, pattern) rules and the fallback label
+MARKET_CAP_RULES = {
+    "Equity": ([
+        ("Large Cap", r'\blarge\s*cap\b|\bbluechip\b|\bnifty\s*50\b|\bsensex\b|\btop\s*100\b|\bfrontline\b|\bbenchmark\b'),
+        ("Mid Cap", r'\bmid\s*cap\b|\bmidcap\b|\bmedium\s*cap\b|\bmid\s*tier\b|\btop\s*150\b'),
+        ("Small Cap", r'\bsmall\s*cap\b|\bsmallcap\b|\bemerging\b|\btop\s*250\b|\bsmid\b|\bgrowth\b|\bsmall\s*tier\b'),
+        ("Multi Cap", r'\bmulti\s*cap\b|\bflexi\s*cap\b|\bdiversified\b|\bbalanced\s*equity\b'),
+        ("Focused/Value", r'\bfocused\b|\bvalue\b|\bcontra\b|\besg\b|\btheme\b|\bstrategy\b'),
+        ("Sectoral/Thematic", r'\bsectoral\b|\bthematic\b|\bbanking\b|\bpharma\b|\btechnology\b|\binfrastructure\b|\benergy\b|\bauto\b'),
+    ], "Multi Cap"),
+    "Debt": ([
+        ("Sectoral/Thematic", r'\bduration\b|\bgilt\b|\bbond\b|\bcredit\b|\byield\b|\bcorporate\b|\bdynamic\b|\btactical\b|\bsovereign\b'),
+        ("Large Cap", r'\bliquid\b|\bovernight\b|\bshort\s*duration\b|\bmoney\s*market\b'),
+    ], "Focused/Value"),
+    "Index/ETF": ([
+        ("Large Cap", r'\bnifty\s*50\b|\bsensex\b|\blarge\s*cap\b|\btop\s*50\b'),
+        ("Mid/Small Cap", r'\bmid\s*cap\b|\bsmall\s*cap\b|\btop\s*250\b|\bemerging\b'),
+    ], "Sectoral/Thematic"),
+    "Gold": ([], "Sectoral/Thematic"),
+    "Specialized": ([], "Focused/Value"),
+}
+MARKET_CAP_RULES["Hybrid"] = MARKET_CAP_RULES["Debt"]
+
+# SEBI category (as in the NAVAll.txt headers, normalised by category_key)
+# -> (AssetClass, MarketCap). A MarketCap of None means the category does not
+# pin one, so the market cap rules run with the category's asset class.
+SEBI_CATEGORY_CLASSES = {
+    "equity scheme - large cap fund": ("Equity", "Large Cap"),
+    "equity scheme - large & mid cap fund": ("Equity", "Multi Cap"),
+    "equity scheme - mid cap fund": ("Equity", "Mid Cap"),
+    "equity scheme - small cap fund": ("Equity", "Small Cap"),
+    "equity scheme - multi cap fund": ("Equity", "Multi Cap"),
+    "equity scheme - flexi cap fund": ("Equity", "Multi Cap"),
+    "equity scheme - focused fund": ("Equity", "Focused/Value"),
+    "equity scheme - value fund": ("Equity", "Focused/Value"),
+    "equity scheme - contra fund": ("Equity", "Focused/Value"),
+    "equity scheme - dividend yield fund": ("Equity", "Focused/Value"),
+    "equity scheme - sectoral/thematic": ("Equity", "Sectoral/Thematic"),
+    "equity scheme - elss": ("Specialized", None),
+    "debt scheme - overnight fund": ("Liquid", None),
+    "debt scheme - liquid fund": ("Liquid", None),
+    "debt scheme - money market fund": ("Liquid", None),
+    "debt scheme - ultra short duration fund": ("Liquid", None),
+    "debt scheme - low duration fund": ("Liquid", None),
+    "debt scheme - floater fund": ("Liquid", None),
+    "debt scheme - short duration fund": ("Debt", None),
+    "debt scheme - medium duration fund": ("Debt", None),
+    "debt scheme - medium to long duration fund": ("Debt", None),
+    "debt scheme - long duration fund": ("Debt", None),
+    "debt scheme - dynamic bond": ("Debt", None),
+    "debt scheme - corporate bond fund": ("Debt", None),
+    "debt scheme - credit risk fund": ("Debt", None),
+    "debt scheme - banking and psu fund": ("Debt", None),
+    "debt scheme - gilt fund": ("Debt", None),
+    "debt scheme - gilt fund with 10 year constant duration": ("Debt", None),
+    "hybrid scheme - conservative hybrid fund": ("Hybrid", None),
+    "hybrid scheme - balanced hybrid fund": ("Hybrid", None),
+    "hybrid scheme - aggressive hybrid fund": ("Hybrid", None),
+    "hybrid scheme - dynamic asset allocation or balanced advantage": ("Hybrid", None),
+    "hybrid scheme - multi asset allocation": ("Hybrid", None),
+    "hybrid scheme - arbitrage fund": ("Hybrid", None),
+    "hybrid scheme - equity savings": ("Hybrid", None),
+    "solution oriented scheme - retirement fund": ("Specialized", None),
+    "solution oriented scheme - children's fund": ("Specialized", None),
+    "other scheme - index funds": ("Index/ETF", None),
+    "other scheme - other etfs": ("Index/ETF", None),
+    "other scheme - gold etf": ("Gold", None),
+    "other scheme - fof overseas": ("Index/ETF", None),
+    "other scheme - fof domestic": ("Index/ETF", None),
+    # Pre-2018 categories still used for close ended and interval schemes
+    "income": ("Debt", None),
+    "growth": ("Equity", None),
+    "elss": ("Specialized", None),
+    "money market": ("Liquid", None),
+    "gilt": ("Debt", None),
+    "balanced": ("Hybrid", None),
+    "gold etf": ("Gold", None),
+    "other etfs": ("Index/ETF", None),
+    "fund of funds investing overseas": ("Index/ETF", None),
+}
+
+# Fingerprint of the rules; cached classifications made with other rules are redone
+RULES_VERSION = hashlib.md5(repr((ASSET_CLASS_RULES, MARKET_CAP_RULES)).encode("utf-8")).hexdigest()[:12]
+
+_ASSET_CLASS_PATTERNS = [(label, re.compile(pattern)) for label, pattern in ASSET_CLASS_RULES]
+_MARKET_CAP_PATTERNS = {
+    asset_class: ([(label, re.compile(pattern)) for label, pattern in rules], fallback)
+    for asset_class, (rules, fallback) in MARKET_CAP_RULES.items()
+}
+
+
+def classify_asset_class(scheme_name):
+    """Asset class of one scheme name (first matching rule wins, else 'Other')."""
+    scheme_name = scheme_name.lower().strip()
+    for label, pattern in _ASSET_CLASS_PATTERNS:
+        if pattern.search(scheme_name):
+            return label
+    return "Other"
+
+
+def classify_market_cap(scheme_name, asset_class):
+    """Market cap of one scheme name, given its asset class."""
+    scheme_name = scheme_name.lower().strip()
+    if asset_class not in _MARKET_CAP_PATTERNS:
+        #  Keep some "Other" for unknowns
+        return "Other" if "fund" not in scheme_name else "Multi Cap"
+    rules, fallback = _MARKET_CAP_PATTERNS[asset_class]
+    for label, pattern in rules:
+        if pattern.search(scheme_name):
+            return label
+    return fallback
+
+
+def category_key(category):
+    """Normalises a NAVAll.txt category for SEBI_CATEGORY_CLASSES lookups."""
+    key = re.sub(r"\s+", " ", str(category).strip().lower().replace("’", "'"))
+    return re.sub(r"\s*/\s*", "/", key)
+
+
+def classify_by_category(names, categories):
+    """
+    Classifies names from their SEBI categories (aligned with `names`).
+    Returns a Scheme, AssetClass, MarketCap frame for the names whose
+    category is known; the others are left to the regex rules.
+    """
+    table = pd.DataFrame({"Scheme": names, "Category": categories}).dropna()
+    classes = table["Category"].map(category_key).map(SEBI_CATEGORY_CLASSES).dropna()
+    table = table.loc[classes.index]
+    table["AssetClass"] = [asset_class for asset_class, _ in classes]
+    table["MarketCap"] = [
+        market_cap if market_cap is not None else classify_market_cap(name, asset_class)
+        for name, (asset_class, market_cap) in zip(table["Scheme"], classes)
+    ]
+    return table[["Scheme", "AssetClass", "MarketCap"]].drop_duplicates("Scheme").reset_index(drop=True)
+
+
+def classify_names(names):
+    """Classifies distinct names; returns a Scheme, AssetClass, MarketCap frame."""
+    names = pd.unique(pd.Series(names, dtype=object))
+    asset_classes = [classify_asset_class(name) for name in names]
+    market_caps = [classify_market_cap(name, cls) for name, cls in zip(names, asset_classes)]
+    return pd.DataFrame({"Scheme": names, "AssetClass": asset_classes, "MarketCap": market_caps})
+
+
+# ------------------------
+# Cached classification
+# ------------------------
+def load_class_table(path):
+    """Cached classifications made with the current rules, or an empty table."""
+    columns = ["Scheme", "AssetClass", "MarketCap"]
+    if not path or not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    table = table[table["Rules"] == RULES_VERSION]
+    return table[columns].drop_duplicates("Scheme").reset_index(drop=True)
+
+
+def load_scheme_categories(path):
+    """
+    Scheme name → SEBI category Series from the backend's
+    amfi_scheme_categories.csv, or None when the file is not there.
+    """
+    if not path or not os.path.exists(path):
+        print(f"⚠️ No scheme categories at {path}; using the regex rules only.")
+        return None
+    categories = pd.read_csv(path, usecols=["Scheme", "Category"], dtype=str).dropna()
+    categories["Scheme"] = categories["Scheme"].str.strip().str.lower()
+    return categories.drop_duplicates("Scheme").set_index("Scheme")["Category"]
+
+
+def classify_schemes(schemes, cache_path=None, categories=None):
+    """
+    AssetClass and MarketCap for every entry of `schemes` (already normalised
+    names). Names found in `categories` (name → SEBI category, see
+    load_scheme_categories) are classified from their category. Only the
+    remaining names missing from the cache at `cache_path` are run through the
+    regex rules; the cache is then extended and saved.
+    Returns (asset_class, market_cap) as categoricals aligned with `schemes`.
+    """
+    schemes = pd.Series(schemes, dtype=object).fillna("")
+    unique_names = pd.unique(schemes)
+
+    by_category = pd.DataFrame(columns=["Scheme", "AssetClass", "MarketCap"])
+    if categories is not None:
+        by_category = classify_by_category(unique_names, categories.reindex(unique_names).to_numpy())
+    fallback_names = unique_names[~pd.Index(unique_names).isin(by_category["Scheme"])]
+
+    table = load_class_table(cache_path)
+    new_names = fallback_names[~pd.Index(fallback_names).isin(table["Scheme"])]
+    if len(new_names):
+        table = pd.concat([table, classify_names(new_names)], ignore_index=True)
+        if cache_path:
+            table.assign(Rules=RULES_VERSION).to_csv(cache_path, index=False)
+    print(f"✅ Scheme classes: {len(unique_names)} distinct names, {len(by_category)} from SEBI categories, "
+          f"{len(fallback_names)} from the regex rules ({len(new_names)} newly classified).")
+
+    table = pd.concat([by_category, table[table["Scheme"].isin(fallback_names)]], ignore_index=True)
+
+    # 📌 Broadcast through the name codes instead of re-matching per row
+    codes = pd.Categorical(schemes, categories=table["Scheme"]).codes
+    asset_class = pd.Categorical(table["AssetClass"].to_numpy()[codes])
+    market_cap = pd.Categorical(table["MarketCap"].to_numpy()[codes])
+    return (pd.Series(asset_class, index=schemes.index, name="AssetClass"),
+            pd.Series(market_cap, index=schemes.index, name="MarketCap"))
+
+
+# ------------------------
+# Balanced labels
+# ------------------------
+def assign_balanced_labels(df, class_col, targets, seed=42, key=None):
+    """
+    Balanced_<class> labels for `df`: for each class in `targets`
+    (class → BalancedCount, e.g. from balance_distribution), a random subset
+    of its rows keeps the class label and every other row gets NaN.
+
+    All classes are handled in one pass: every unit gets a random rank within
+    its class and is labelled while the class's running row count stays within
+    its target. Units are rows by default; with `key` (e.g. "SchemeID") they
+    are whole (key, class) groups, so a scheme's rows are kept or dropped
+    together. The same seed always gives the same labels.
+    Returns a categorical Series aligned with `df`.
+    """
+    rng = np.random.default_rng(seed)
+    codes, class_names = pd.factorize(df[class_col])
+
+    if key is None:
+        row_unit = None
+        unit_codes = codes
+        unit_size = np.ones(len(codes), dtype="int64")
+    else:
+        units = pd.DataFrame({"key": df[key].to_numpy(), "class": codes})
+        row_unit = units.groupby(["key", "class"], sort=False).ngroup().to_numpy()
+        unit_codes = np.empty(row_unit.max() + 1 if len(row_unit) else 0, dtype=codes.dtype)
+        unit_codes[row_unit] = codes
+        unit_size = np.bincount(row_unit)
+
+    limits = pd.Series(targets, dtype="float64").reindex(class_names).fillna(0).to_numpy()
+
+    # Random order within each class (shuffle, then stable sort by class),
+    # then running row count per class
+    shuffled = rng.permutation(len(unit_codes))
+    order = shuffled[np.argsort(unit_codes[shuffled], kind="stable")]
+    sorted_codes = unit_codes[order]
+    sorted_size = unit_size[order]
+    running = np.cumsum(sorted_size)
+    class_start = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    running -= np.repeat(running[class_start] - sorted_size[class_start], np.diff(np.r_[class_start, len(order)]))
+
+    selected = np.zeros(len(unit_codes), dtype=bool)
+    valid = sorted_codes >= 0
+    selected[order[valid]] = running[valid] <= limits[sorted_codes[valid]]
+
+    label_codes = np.where(selected, unit_codes, -1)
+    if row_unit is not None:
+        label_codes = label_codes[row_unit]
+    labels = pd.Categorical.from_codes(label_codes, categories=pd.Index(np.asarray(class_names)))
+    labels = labels.remove_unused_categories()
+    return pd.Series(labels.set_categories(sorted(labels.categories)), index=df.index)
@@ -0,0 +1,139 @@
+"""
+Cluster-count and PCA-dimension selection for the phase 4-5 risk model.
+
+Phase 4-5 hard-codes k = 3 on 2 principal components because a full
+silhouette score over millions of rows is quadratic. This sweeps a grid
+of (k, n_components) candidates in parallel, one candidate per core, and
+scores each on:
+
+- inertia and the Calinski-Harabasz index of the fit on all units;
+- the silhouette score on a fixed random sample;
+- stability: the adjusted Rand index between the full fit and fits on
+  bootstrap resamples, compared on a fixed evaluation sample.
+
+The units are rows by default, the same level phase 4-5 fits its k-means
+on (DEFAULT_CLUSTER_LEVEL); --level scheme / scheme_month sweeps the
+opt-in aggregated levels instead.
+
+    python -m pipeline.cluster_selection "AFTER_PHASE_3(transformation).csv" --report cluster_selection.csv
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score, calinski_harabasz_score, silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from pipeline.risk_model import (
+    CLUSTER_ALGORITHMS, CLUSTER_LEVELS, DEFAULT_CLUSTER_LEVEL, RISK_FEATURES, aggregate_features, make_clusterer
+)
+from pipeline.snapshot import read_table
+
+
+K_VALUES = (2, 3, 4, 5, 6)
+N_COMPONENTS_VALUES = (2, 3, 4)
+
+
+# ------------------------
+# Scoring
+# ------------------------
+def _score_candidate(X_pca, k, n_components, algorithm, eval_idx, bootstrap_size, n_bootstrap,
+                     random_state):
+    start = time.perf_counter()
+    model = make_clusterer(k, algorithm, random_state).fit(X_pca)
+    fit_s = time.perf_counter() - start
+
+    labels = model.labels_
+    eval_points = X_pca[eval_idx]
+    eval_labels = labels[eval_idx]
+
+    rng = np.random.default_rng(random_state)
+    stability = []
+    for b in range(n_bootstrap):
+        resample = rng.choice(len(X_pca), size=bootstrap_size, replace=True)
+        boot = make_clusterer(k, algorithm, random_state + b + 1).fit(X_pca[resample])
+        stability.append(adjusted_rand_score(eval_labels, boot.predict(eval_points)))
+
+    silhouette = np.nan
+    if len(np.unique(eval_labels)) > 1:
+        silhouette = silhouette_score(eval_points, eval_labels)
+
+    return {
+        "k": k,
+        "n_components": n_components,
+        "inertia": model.inertia_,
+        "silhouette_sampled": silhouette,
+        "calinski_harabasz": calinski_harabasz_score(X_pca, labels),
+        "bootstrap_ari_mean": np.mean(stability) if stability else np.nan,
+        "bootstrap_ari_min": np.min(stability) if stability else np.nan,
+        "smallest_cluster_share": np.bincount(labels, minlength=k).min() / len(labels),
+        "fit_seconds": fit_s,
+    }
+
+
+def sweep_cluster_models(X, k_values=K_VALUES, n_components_values=N_COMPONENTS_VALUES,
+                         algorithm="kmeans", sample_size=10_000, bootstrap_size=50_000,
+                         n_bootstrap=5, n_jobs=-1, random_state=42):
+    """
+    Scores every (k, n_components) candidate on the feature matrix X.
+    X is standardized once and projected once per dimensionality; the k-means
+    fits then run in parallel. The silhouette and the bootstrap ARIs use the
+    same evaluation sample of at most `sample_size` units. Returns the report
+    as a DataFrame with one row per candidate.
+    """
+    X_scaled = StandardScaler().fit_transform(X)
+    n_units = len(X_scaled)
+    rng = np.random.default_rng(random_state)
+    eval_idx = np.sort(rng.choice(n_units, size=min(sample_size, n_units), replace=False))
+    bootstrap_size = min(bootstrap_size, n_units)
+
+    projections, explained = {}, {}
+    for n_components in n_components_values:
+        pca = PCA(n_components=n_components, random_state=random_state)
+        projections[n_components] = pca.fit_transform(X_scaled)
+        explained[n_components] = pca.explained_variance_ratio_.sum()
+
+    rows = Parallel(n_jobs=n_jobs)(
+        delayed(_score_candidate)(projections[n_components], k, n_components, algorithm, eval_idx,
+                                  bootstrap_size, n_bootstrap, random_state)
+        for n_components in n_components_values
+        for k in k_values
+    )
+    report = pd.DataFrame(rows)
+    report.insert(2, "explained_variance", report["n_components"].map(explained))
+    report.insert(0, "n_units", n_units)
+    return report.sort_values(["n_components", "k"]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep k and PCA dimensions for the risk clustering.")
+    parser.add_argument("input", help="AFTER_PHASE_3(transformation) file")
+    parser.add_argument("--report", default="cluster_selection_report.csv")
+    parser.add_argument("--level", choices=CLUSTER_LEVELS, default=DEFAULT_CLUSTER_LEVEL)
+    parser.add_argument("--algorithm", choices=CLUSTER_ALGORITHMS, default="kmeans")
+    parser.add_argument("--k", type=int, nargs="+", default=list(K_VALUES))
+    parser.add_argument("--components", type=int, nargs="+", default=list(N_COMPONENTS_VALUES))
+    parser.add_argument("--sample-size", type=int, default=10_000)
+    parser.add_argument("--bootstrap", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    df = read_table(args.input, columns=["SchemeID", "Date"] + RISK_FEATURES, parse_dates=["Date"])
+    X, _ = aggregate_features(df, RISK_FEATURES, level=args.level)
+    print(f"📌 Sweeping {len(args.k) * len(args.components)} candidates on {len(X)} {args.level} units")
+
+    start = time.perf_counter()
+    report = sweep_cluster_models(X, args.k, args.components, args.algorithm,
+                                  sample_size=args.sample_size, n_bootstrap=args.bootstrap,
+                                  n_jobs=args.jobs)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    report.to_csv(args.report, index=False)
+    print(f"✅ Cluster selection report saved to: {args.report} ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Flat, memory-mappable form of the phase 4-5 random forest.
+
+The fitted RandomForestClassifier pickle carries every tree's full node
+structs (impurity, sample counts, per-node class values) and is slow to
+joblib.load. export_forest() keeps only what prediction needs, as one set
+of flat arrays for all trees:
+
+- feature, threshold: split feature and threshold per node; a leaf has
+                      feature == -1
+- children:           (left, right) global child node indices per node;
+                      for a leaf both hold the leaf's row in leaf_proba
+- missing_left:       where a NaN feature value goes at each split
+- leaf_proba:         normalized class distribution per leaf
+- roots:              first node of each tree
+
+Each array is saved as a .npy file with a meta.json describing the model.
+CompactForest loads them memory-mapped and predicts a batch by walking
+every (sample, tree) pair down one level per step, with the same float32
+comparison and probability averaging as scikit-learn, so the predictions
+are identical. It loads far faster than the pickle, but the walk is only
+faster than scikit-learn's compiled one on small batches (a few hundred
+rows), so large batches are better served by the pickle.
+
+    python -m pipeline.compact_forest random_forest_risk_classifier_final.pkl random_forest_risk_classifier_final_compact
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+
+ARRAYS = ("feature", "threshold", "children", "missing_left", "leaf_proba", "roots")
+META_FILE = "meta.json"
+
+
+# ------------------------
+# Export
+# ------------------------
+def export_forest(model, out_dir):
+    """Writes the flat arrays and meta.json for a fitted RandomForestClassifier."""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    n_classes = len(model.classes_)
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+    feature, threshold, children, missing_left, leaf_proba = [], [], [], [], []
+    n_leaves = 0
+    for tree, offset in zip(trees, offsets):
+        is_leaf = tree.children_left == -1
+        leaf_ids = np.cumsum(is_leaf) - 1 + n_leaves
+        n_leaves += int(is_leaf.sum())
+
+        feature.append(np.where(is_leaf, -1, tree.feature).astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        children.append(np.column_stack([
+            np.where(is_leaf, leaf_ids, tree.children_left + offset),
+            np.where(is_leaf, leaf_ids, tree.children_right + offset),
+        ]).astype(np.int32))
+        missing_left.append(np.asarray(tree.missing_go_to_left, dtype=np.uint8))
+
+        values = tree.value[is_leaf, 0, :n_classes]
+        totals = values.sum(axis=1, keepdims=True)
+        leaf_proba.append(values / np.where(totals == 0, 1, totals))
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "children": np.concatenate(children),
+        "missing_left": np.concatenate(missing_left),
+        "leaf_proba": np.concatenate(leaf_proba).astype(np.float64),
+        "roots": offsets[:-1].astype(np.int32),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(out_dir, f"{name}.npy"), arrays[name])
+
+    feature_names = getattr(model, "feature_names_in_", None)
+    meta = {
+        "n_trees": len(trees),
+        "n_nodes": int(offsets[-1]),
+        "n_leaves": n_leaves,
+        "n_features": int(model.n_features_in_),
+        "classes": np.asarray(model.classes_).tolist(),
+        "feature_names": None if feature_names is None else list(map(str, feature_names)),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"✅ Compact forest saved to: {out_dir} ({meta['n_trees']} trees, {meta['n_nodes']} nodes)")
+    return out_dir
+
+
+def forest_size(path):
+    """Bytes on disk of a pickle file or a compact forest directory."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+# ------------------------
+# Inference
+# ------------------------
+class CompactForest:
+    """Memory-mapped flat random forest with a vectorized predict / predict_proba."""
+
+    def __init__(self, arrays, meta):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.n_trees = meta["n_trees"]
+        self.classes_ = np.asarray(meta["classes"])
+        if meta["feature_names"] is not None:
+            self.feature_names_in_ = np.asarray(meta["feature_names"], dtype=object)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(arrays, meta)
+
+    def apply(self, X):
+        """Leaf row in leaf_proba for every (sample, tree) pair, shape (n_samples, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        has_missing = np.isnan(flat_X).any()
+        children = np.asarray(self.children).ravel()  # node * 2 + (0 left, 1 right)
+
+        # One entry per (sample, tree) pair still above a leaf, tree-major so
+        # each step walks the node arrays one tree at a time; trees that are
+        # a single leaf go straight to it
+        active = np.arange(self.n_trees * n_samples)
+        current = np.repeat(np.asarray(self.roots, dtype=np.int64), n_samples)
+        offsets = np.tile(np.arange(n_samples) * n_features, self.n_trees)
+        features = self.feature[current]
+        leaves = np.empty(len(active), dtype=np.int64)
+        at_leaf = features < 0
+        leaves[at_leaf] = children[current[at_leaf] * 2]
+        active, current, offsets = active[~at_leaf], current[~at_leaf], offsets[~at_leaf]
+        features = features[~at_leaf]
+
+        while active.size:
+            values = flat_X[offsets + features]
+            go_right = ~(values <= self.threshold[current])
+            if has_missing:
+                missing = np.isnan(values)
+                go_right[missing] = self.missing_left[current[missing]] == 0
+            nxt = children[current * 2 + go_right]
+            next_features = self.feature[nxt]
+            internal = next_features >= 0
+            done = ~internal
+            leaves[active[done]] = children[nxt[done] * 2]
+            active, current, offsets = active[internal], nxt[internal], offsets[internal]
+            features = next_features[internal]
+
+        return leaves.reshape(self.n_trees, n_samples).T
+
+    def predict_proba(self, X):
+        leaves = self.apply(X).T  # (n_trees, n_samples)
+        # Reduced over the leading axis, so the trees are summed one after the
+        # other, in scikit-learn's order
+        proba = np.add.reduce(self.leaf_proba[leaves], axis=0)
+        return proba / self.n_trees
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m pipeline.compact_forest MODEL.pkl OUT_DIR")
+    import joblib
+
+    export_forest(joblib.load(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,442 @@
+"""
+Incremental daily update of the phase 5 feature file.
+
+A full run recomputes every phase 2 feature over the whole NAV history.
+When one new day of NAVs arrives, each feature of an affected scheme can
+be carried forward from a small per-scheme state instead:
+
+- Daily_Return:        the last NAV
+- period returns:      the first NAV of the open month, quarter and year
+- period STDs:         count, mean and M2 of the row-level period returns
+                       of the closed periods, combined with the open one
+- rolling volatility:  the last 252 daily returns and the last valid value
+                       of each window (for phase 2's forward fill)
+- CAGR_1Y, CAGR_2Y:    the NAVs of the last two years (plus the last one
+                       before) for the nearest-date lookup
+- Max_Drawdown:        running peak and worst drawdown
+- Downside_STD:        count and sum of squares of the negative returns
+
+IncrementalState.build() derives the state once from the NAV history and
+the phase 5 file, with phase 2's rules. update() applies new NAVs in
+O(window) per scheme, vectorized over the schemes of a day, and
+phase5_rows() turns the updated features into phase 5 rows: the scheme's
+last row (names and class labels) with the new features, the phase 3
+transforms with the saved winsorize bounds, the phase 4-5 median fill and
+the risk model's Cluster_Label when a model is given (otherwise the
+scheme keeps its label). Only those rows are appended to the phase 5
+CSV, so the backend's latest-row-per-scheme view picks them up. Earlier
+rows keep the values they were written with until a full run.
+
+    python -m pipeline.incremental init --history after_phase_1.csv --features phase5_processed_funds_data_final.csv
+    python -m pipeline.incremental update new_navs.csv --bounds phase3_winsorize_bounds.json --model random_forest_risk_classifier_final_compact
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline.nav_features import (
+    PERIODS, RISK_FREE_RATE, ROLLING_WINDOWS, drawdown_table, group_bounds, horizon_months, period_keys,
+    period_returns, rolling_stats
+)
+from pipeline.outliers import PHASE3_TRANSFORMS, apply_transforms, load_bounds, transformed_name
+from pipeline.paths import DATA_FILES, data_path
+from pipeline.risk_model import RISK_FEATURES, RISK_MAP
+from pipeline.snapshot import DATE_COLUMNS, read_table
+from pipeline.streaming_fit import FILL_MEDIAN_COLUMNS
+
+
+CAGR_HORIZONS = ("1Y", "2Y")
+RETURN_WINDOW = max(window for window, _ in ROLLING_WINDOWS.values())
+# Free columns added to the CAGR buffers when a scheme's buffer is full
+CAGR_SLACK = 32
+NAT = np.iinfo(np.int64).min
+
+STATE_ARRAYS = "state.npz"
+TEMPLATES_FILE = "templates.feather"
+META_FILE = "meta.json"
+
+FEATURE_COLUMNS = (
+    ["NAV", "Daily_Return"] + list(PERIODS)
+    + [column for pair in PERIODS.values() for column in pair]
+    + [f"CAGR_{horizon}" for horizon in CAGR_HORIZONS]
+    + ["Max_Drawdown", "Downside_STD", "Sharpe_Ratio", "Sortino_Ratio"]
+    + [f"Rolling_Volatility_{name}" for name in ROLLING_WINDOWS]
+)
+
+
+def combine_moments(count, mean, m2, n, value):
+    """Adds `n` copies of `value` to running (count, mean, M2) moments, elementwise."""
+    total = count + n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = value - mean
+        new_mean = np.where(count > 0, mean + delta * n / total, value)
+        new_m2 = np.where(count > 0, m2 + delta ** 2 * count * n / total, 0.0)
+    return total, new_mean, new_m2
+
+
+def right_aligned(groups, values, n_groups, width, fill):
+    """(n_groups, width) array with each group's last `width` values at the right end."""
+    from_end = pd.Series(groups).groupby(groups).cumcount(ascending=False).to_numpy()
+    keep = from_end < width
+    out = np.full((n_groups, width), fill, dtype=np.asarray(values).dtype)
+    out[groups[keep], width - 1 - from_end[keep]] = values[keep]
+    return out
+
+
+def load_risk_model(path):
+    """The phase 4-5 forest: a compact export directory or a joblib pickle."""
+    if os.path.isdir(path):
+        from pipeline.compact_forest import CompactForest
+
+        return CompactForest.load(path)
+    import joblib
+
+    return joblib.load(path)
+
+
+class IncrementalState:
+    """Per-scheme feature state, indexed by the sorted SchemeID array."""
+
+    def __init__(self, arrays, templates, meta):
+        self.arrays = arrays
+        self.ids = arrays["SchemeID"]
+        self.templates = templates
+        self.meta = meta
+
+    # ------------------------
+    # Build from the full history
+    # ------------------------
+    @classmethod
+    def build(cls, history, phase5, risk_free_rate=RISK_FREE_RATE):
+        """
+        State for the schemes in both the NAV history (phase 2 input) and the
+        phase 5 file, as of the history's latest date.
+        """
+        phase5 = phase5.assign(**{column: pd.to_datetime(phase5[column])
+                                  for column in DATE_COLUMNS if column in phase5.columns})
+        templates = phase5.sort_values("Date", kind="stable").groupby("SchemeID").tail(1)
+        templates = templates.set_index("SchemeID").sort_index()
+
+        df = history[["SchemeID", "Date", "NAV"]].assign(Date=pd.to_datetime(history["Date"]))
+        df = df[df["SchemeID"].isin(templates.index)].dropna(subset=["NAV"])  # as phase 1 leaves it
+        df = df.sort_values(["SchemeID", "Date"], kind="stable")
+        df = df.reset_index(drop=True)
+        if df.empty:
+            raise ValueError("❌ No scheme of the phase 5 file is in the NAV history.")
+        df["Daily_Return"] = df.groupby("SchemeID")["NAV"].pct_change()
+
+        scheme_ids = df["SchemeID"].to_numpy()
+        starts = group_bounds(scheme_ids)
+        sizes = np.diff(np.append(starts, len(df)))
+        groups = np.repeat(np.arange(len(starts)), sizes)
+        last = starts + sizes - 1
+        nav = df["NAV"].to_numpy(dtype=float)
+        dates = df["Date"].to_numpy().astype("datetime64[ns]")
+        positions = np.arange(len(df), dtype=float)
+        templates = templates.loc[scheme_ids[starts]]
+
+        arrays = {"SchemeID": scheme_ids[starts], "last_date": dates[last], "last_nav": nav[last]}
+
+        # Period returns over the full history, as phase 2 computes them
+        rows, _ = period_returns(df)
+        keys, _ = period_keys(dates)
+        for name, (return_col, _) in PERIODS.items():
+            is_open = keys[name] == np.repeat(keys[name][last], sizes)
+            first = np.fmin.reduceat(np.where(is_open, positions, np.nan), starts).astype("int64")
+            closed = pd.Series(rows[return_col].to_numpy()).where(~is_open)
+            stats = closed.groupby(groups).agg(["count", "mean", "var"])
+            arrays[f"{name}_key"] = keys[name][last]
+            arrays[f"{name}_first"] = nav[first]
+            arrays[f"{name}_rows"] = np.add.reduceat(is_open.astype("int64"), starts)
+            arrays[f"{name}_count"] = stats["count"].to_numpy(dtype="int64")
+            arrays[f"{name}_mean"] = stats["mean"].fillna(0).to_numpy()
+            arrays[f"{name}_m2"] = (stats["var"].fillna(0) * (stats["count"] - 1).clip(lower=0)).to_numpy()
+
+        # Phase 2 drops each scheme's first row (no Daily_Return) before the
+        # drawdown, downside and rolling features
+        kept = df[df["Daily_Return"].notna()].reset_index(drop=True)
+        kept_groups = np.searchsorted(arrays["SchemeID"], kept["SchemeID"].to_numpy())
+        n_schemes = len(starts)
+
+        drawdowns = drawdown_table(kept).set_index("SchemeID")["Max_Drawdown"]
+        arrays["peak"] = kept.groupby("SchemeID")["NAV"].max().reindex(arrays["SchemeID"]).to_numpy()
+        arrays["max_drawdown"] = drawdowns.reindex(arrays["SchemeID"]).to_numpy()
+        negative = kept["Daily_Return"].where(kept["Daily_Return"] < 0)
+        arrays["down_count"] = negative.groupby(kept["SchemeID"]).count().reindex(
+            arrays["SchemeID"], fill_value=0).to_numpy(dtype="int64")
+        arrays["down_sumsq"] = (negative ** 2).groupby(kept["SchemeID"]).sum().reindex(
+            arrays["SchemeID"], fill_value=0.0).to_numpy()
+
+        rolling = rolling_stats(kept, "Daily_Return", ROLLING_WINDOWS, ("std",))
+        rolling = rolling.groupby(kept["SchemeID"]).ffill()
+        rolling_medians = {}  # phase 2's last fallback, kept as of the build
+        for column in rolling.columns:
+            arrays[f"last_{column}"] = rolling[column].groupby(kept_groups).last().reindex(
+                range(n_schemes)).to_numpy()
+            filled = rolling[column].fillna(rolling[column].groupby(kept["SchemeID"]).transform("mean"))
+            rolling_medians[column] = float(filled.median())
+        arrays["returns"] = right_aligned(kept_groups, kept["Daily_Return"].to_numpy(dtype=float),
+                                          n_schemes, RETURN_WINDOW, np.nan)
+
+        # NAVs after the longest CAGR cutoff, plus the last one on or before it
+        as_of = pd.Timestamp(dates.max())
+        cutoff = np.datetime64(as_of - pd.DateOffset(months=max(map(horizon_months, CAGR_HORIZONS))), "ns")
+        before = dates <= cutoff
+        last_before = np.fmax.reduceat(np.where(before, positions, np.nan), starts)
+        keep = ~before | (positions == np.repeat(last_before, sizes))
+        width = int(np.bincount(groups[keep], minlength=n_schemes).max()) + CAGR_SLACK
+        arrays["cagr_dates"] = right_aligned(groups[keep], dates[keep].astype("int64"), n_schemes, width, NAT)
+        arrays["cagr_navs"] = right_aligned(groups[keep], nav[keep], n_schemes, width, np.nan)
+
+        meta = {
+            "as_of": as_of.isoformat(),
+            "risk_free_rate": risk_free_rate,
+            "columns": list(phase5.columns),
+            "fill_medians": {column: float(phase5[column].median())
+                             for column in FILL_MEDIAN_COLUMNS if column in phase5.columns},
+            "rolling_medians": rolling_medians,
+        }
+        print(f"✅ Incremental state built: {n_schemes} schemes as of {as_of.date()}")
+        return cls({name: np.array(values) for name, values in arrays.items()}, templates, meta)
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        targets = {
+            STATE_ARRAYS: lambda f: np.savez(f, **self.arrays),
+            TEMPLATES_FILE: lambda f: self.templates.reset_index().to_feather(f),
+            META_FILE: lambda f: f.write(json.dumps(self.meta, indent=2).encode()),
+        }
+        for name, write in targets.items():
+            tmp_path = os.path.join(path, f"{name}.tmp")
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, os.path.join(path, name))
+        print(f"💾 Incremental state saved to: {path}")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(os.path.join(path, STATE_ARRAYS)) as saved:
+            arrays = {name: saved[name] for name in saved.files}
+        templates = pd.read_feather(os.path.join(path, TEMPLATES_FILE)).set_index("SchemeID")
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(arrays, templates, meta)
+
+    # ------------------------
+    # Daily update
+    # ------------------------
+    def _widen_cagr(self):
+        for name, fill in (("cagr_dates", NAT), ("cagr_navs", np.nan)):
+            self.arrays[name] = np.pad(self.arrays[name], ((0, 0), (CAGR_SLACK, 0)), constant_values=fill)
+
+    def _apply_day(self, date, pos, nav):
+        """Features of the rows (pos, nav) dated `date`, updating the state in place."""
+        a = self.arrays
+        prev = a["last_nav"][pos]
+        out = {"SchemeID": self.ids[pos], "Date": date, "NAV": nav}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            daily = nav / prev - 1
+        out["Daily_Return"] = daily
+
+        # Open month / quarter / year: roll over or extend, then combine with the closed periods
+        keys, period_starts = period_keys(np.array([date], dtype="datetime64[ns]"))
+        for name, (return_col, std_col) in PERIODS.items():
+            key = keys[name][0]
+            count, mean, m2 = a[f"{name}_count"][pos], a[f"{name}_mean"][pos], a[f"{name}_m2"][pos]
+            first, rows = a[f"{name}_first"][pos], a[f"{name}_rows"][pos]
+            rolled = a[f"{name}_key"][pos] != key
+            with np.errstate(divide="ignore", invalid="ignore"):
+                closing = (prev - first) / first
+            fold = rolled & ~np.isnan(closing)
+            folded = combine_moments(count, mean, m2, rows, closing)
+            count, mean, m2 = (np.where(fold, new, old) for new, old in zip(folded, (count, mean, m2)))
+            first = np.where(rolled, nav, first)
+            rows = np.where(rolled, 1, rows + 1)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                period_return = (nav - first) / first
+                total, _, total_m2 = combine_moments(count, mean, m2, rows, period_return)
+                out[std_col] = np.where(total > 1, np.sqrt(total_m2 / (total - 1)), np.nan)
+            out[name] = period_starts[name][0]
+            out[return_col] = period_return
+            a[f"{name}_key"][pos] = key
+            a[f"{name}_first"][pos], a[f"{name}_rows"][pos] = first, rows
+            a[f"{name}_count"][pos], a[f"{name}_mean"][pos], a[f"{name}_m2"][pos] = count, mean, m2
+
+        # CAGR: nearest NAV to each cutoff (earlier date on ties), as cagr_table
+        if (a["cagr_dates"][pos, 0] != NAT).any():
+            self._widen_cagr()
+        day = np.datetime64(date, "ns").astype("int64")
+        cagr_dates = np.column_stack([a["cagr_dates"][pos, 1:], np.full(len(pos), day)])
+        cagr_navs = np.column_stack([a["cagr_navs"][pos, 1:], nav])
+        as_of = max(pd.Timestamp(self.meta["as_of"]), pd.Timestamp(date))
+        self.meta["as_of"] = as_of.isoformat()
+        rows_idx = np.arange(len(pos))
+        width = cagr_dates.shape[1]
+        for horizon in CAGR_HORIZONS:
+            months = horizon_months(horizon)
+            target = np.datetime64(as_of - pd.DateOffset(months=months), "ns").astype("int64")
+            before = (cagr_dates <= target).sum(axis=1) - 1
+            has_before = (before >= 0) & (cagr_dates[rows_idx, before.clip(0)] != NAT)
+            after = before + 1
+            has_after = after < width
+            gap_before = target - cagr_dates[rows_idx, before.clip(0)].astype(float)
+            gap_after = cagr_dates[rows_idx, after.clip(max=width - 1)].astype(float) - target
+            use_before = has_before & (~has_after | (gap_before <= gap_after))
+            nav_start = np.where(use_before, cagr_navs[rows_idx, before.clip(0)],
+                                 np.where(has_after, cagr_navs[rows_idx, after.clip(max=width - 1)], np.nan))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cagr = (nav / nav_start) ** (12 / months) - 1
+            out[f"CAGR_{horizon}"] = np.where(nav_start > 0, cagr, np.nan)
+
+        # Drop the NAVs that can no longer be the nearest to the longest cutoff
+        cutoff = np.datetime64(as_of - pd.DateOffset(months=max(map(horizon_months, CAGR_HORIZONS))), "ns")
+        last_before = (cagr_dates <= cutoff.astype("int64")).sum(axis=1) - 1
+        stale = np.arange(width) < last_before[:, None]
+        cagr_dates[stale], cagr_navs[stale] = NAT, np.nan
+        a["cagr_dates"][pos], a["cagr_navs"][pos] = cagr_dates, cagr_navs
+
+        # Drawdown and downside deviation
+        peak = np.fmax(a["peak"][pos], nav)
+        a["peak"][pos] = peak
+        a["max_drawdown"][pos] = np.fmin(a["max_drawdown"][pos], (nav - peak) / peak)
+        out["Max_Drawdown"] = a["max_drawdown"][pos]
+        negative = daily < 0
+        a["down_count"][pos] += negative
+        a["down_sumsq"][pos] += np.where(negative, daily ** 2, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            downside = np.sqrt(a["down_sumsq"][pos] / a["down_count"][pos])
+        out["Downside_STD"] = np.where(downside > 0, downside, 1e-6)
+
+        # Rolling volatility over the last window of daily returns, forward-filled
+        returns = np.column_stack([a["returns"][pos, 1:], daily])
+        a["returns"][pos] = returns
+        valid = ~np.isnan(returns)
+        for name, (window, min_periods) in ROLLING_WINDOWS.items():
+            column = f"Rolling_Volatility_{name}"
+            values, count = returns[:, -window:], valid[:, -window:].sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = np.nansum(values, axis=1) / count
+                var = np.nansum((values - mean[:, None]) ** 2, axis=1) / (count - 1)
+            std = np.where(count >= max(min_periods, 2), np.sqrt(var), np.nan)
+            last_valid = np.where(np.isnan(std), a[f"last_{column}"][pos], std)
+            a[f"last_{column}"][pos] = last_valid
+            out[column] = np.where(np.isnan(last_valid), self.meta["rolling_medians"][column], last_valid)
+
+        excess = out["CAGR_1Y"] - self.meta["risk_free_rate"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = excess / out["Yearly_STD"]
+            out["Sortino_Ratio"] = excess / out["Downside_STD"]
+        out["Sharpe_Ratio"] = np.where(np.isfinite(sharpe), sharpe, 0.0)
+
+        a["last_date"][pos] = np.datetime64(date, "ns")
+        a["last_nav"][pos] = nav
+        return pd.DataFrame(out)
+
+    def update(self, navs):
+        """
+        Applies new (SchemeID, Date, NAV) rows day by day and returns the
+        phase 2 features of every applied row. Rows of unknown schemes or not
+        after a scheme's last date are skipped, so re-applying a day is a no-op.
+        """
+        navs = navs[["SchemeID", "Date", "NAV"]].assign(Date=pd.to_datetime(navs["Date"]))
+        navs = navs.dropna().drop_duplicates(["SchemeID", "Date"], keep="last")
+        frames = []
+        for date, day in navs.sort_values(["Date", "SchemeID"]).groupby("Date", sort=True):
+            pos = np.searchsorted(self.ids, day["SchemeID"].to_numpy())
+            known = pos < len(self.ids)
+            known[known] = self.ids[pos[known]] == day["SchemeID"].to_numpy()[known]
+            pos, nav = pos[known], day["NAV"].to_numpy(dtype=float)[known]
+            is_new = self.arrays["last_date"][pos] < np.datetime64(date, "ns")
+            if is_new.any():
+                frames.append(self._apply_day(date, pos[is_new], nav[is_new]))
+        if not frames:
+            return pd.DataFrame(columns=["SchemeID", "Date"] + FEATURE_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def phase5_rows(self, features, bounds, model=None):
+        """
+        Phase 5 rows for updated features: each scheme's last row with the new
+        values, rows with missing values dropped (as phase 3 does), the phase 3
+        transforms, the phase 4-5 median fill and the risk labels.
+        The scheme templates are moved on to the new rows.
+        """
+        columns = self.meta["columns"]
+        rows = self.templates.loc[features["SchemeID"]].reset_index()
+        for column in features.columns:
+            rows[column] = features[column].to_numpy()
+        rows = rows.dropna(subset=[column for column in FEATURE_COLUMNS if column in columns])
+
+        transforms = [(column, kind) for column, kind in PHASE3_TRANSFORMS
+                      if transformed_name(column, kind) in columns]
+        with np.errstate(invalid="ignore"):  # log1p below -1 is NaN, filled with the median below
+            rows = apply_transforms(rows, bounds, transforms)
+        rows = rows.fillna(self.meta["fill_medians"])
+        if model is not None and not rows.empty:
+            X = rows[RISK_FEATURES]
+            rows["Cluster_Label"] = model.predict(X[list(getattr(model, "feature_names_in_", RISK_FEATURES))])
+        if "Risk_Level" in columns:
+            rows["Risk_Level"] = rows["Cluster_Label"].map(RISK_MAP)
+
+        rows = rows.reindex(columns=columns).reset_index(drop=True)
+        latest = rows.drop_duplicates("SchemeID", keep="last").set_index("SchemeID")
+        self.templates.loc[latest.index] = latest[self.templates.columns]
+        return rows
+
+
+# ------------------------
+# CLI
+# ------------------------
+def append_rows(df, path):
+    """Appends `df` to a CSV in the file's own column order."""
+    header = pd.read_csv(path, nrows=0).columns
+    df.reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental daily update of the phase 5 feature file.")
+    parser.add_argument("command", choices=["init", "update"])
+    parser.add_argument("navs", nargs="?", help="New NAV rows (SchemeID, Date, NAV) for update")
+    parser.add_argument("--state", default=data_path("incremental_state", DATA_FILES["incremental_state"]))
+    parser.add_argument("--history", default=None,
+                        help="NAV history: read by init; update appends the new rows to it when given")
+    parser.add_argument("--features", default=data_path("phase5", DATA_FILES["phase5"]))
+    parser.add_argument("--bounds", default=data_path("winsorize_bounds", DATA_FILES["winsorize_bounds"]))
+    parser.add_argument("--model", help="Risk model (compact directory or pickle) for Cluster_Label")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        history_path = args.history or data_path("after_phase_1", DATA_FILES["after_phase_1"])
+        history = read_table(history_path, columns=["SchemeID", "Date", "NAV"], parse_dates=["Date"])
+        state = IncrementalState.build(history, read_table(args.features, parse_dates=["Date"]))
+        state.save(args.state)
+        return
+
+    if args.navs is None:
+        parser.error("update needs the new NAV rows")
+    start = time.perf_counter()
+    state = IncrementalState.load(args.state)
+    navs = pd.read_csv(args.navs, parse_dates=["Date"])
+    features = state.update(navs)
+    model = load_risk_model(args.model) if args.model else None
+    rows = state.phase5_rows(features, load_bounds(args.bounds), model)
+
+    append_rows(rows, args.features)
+    if args.history:
+        applied = navs.merge(features[["SchemeID", "Date"]], on=["SchemeID", "Date"])
+        append_rows(applied, args.history)
+    state.save(args.state)
+    print(f"✅ Incremental update: {len(navs)} NAVs, {features['SchemeID'].nunique()} schemes updated, "
+          f"{len(rows)} rows appended to {args.features} ({time.perf_counter() - start:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
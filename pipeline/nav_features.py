@@ -0,0 +1,474 @@
+"""
+Vectorized per-scheme NAV features used by phase 2.
+
+All functions take the long NAV frame (one row per SchemeID and Date) and
+work on every scheme at once, instead of looping over ``groupby('SchemeID')``
+in Python. The slow implementations they replace are kept at the bottom of
+the module as references for equivalence checks.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+
+HORIZON_PATTERN = re.compile(r"^(\d+)([MY])$")
+
+# Rolling windows used in phase 2: name -> (window, min_periods)
+ROLLING_WINDOWS = {"21D": (21, 5), "Quarter": (62, 15), "Year": (252, 50)}
+ROLLING_STATS = {"std": "Volatility", "mean": "Mean", "downside": "Downside"}
+
+# Calendar periods used in phase 2: period column -> (return column, std column)
+PERIODS = {
+    "Month": ("Monthly_Return", "Monthly_STD"),
+    "Quarter": ("Quarterly_Return", "Quarterly_STD"),
+    "Year": ("Yearly_Return", "Yearly_STD"),
+}
+
+# Annual risk-free rate for the Sharpe and Sortino ratios (phase 2)
+RISK_FREE_RATE = 0.065
+
+
+def horizon_months(horizon):
+    """Parses a horizon label such as '3M', '6M', '1Y' or '3Y' into months."""
+    match = HORIZON_PATTERN.match(horizon)
+    if not match:
+        raise ValueError(f"❌ Unknown horizon '{horizon}', expected e.g. '6M' or '2Y'.")
+    count, unit = int(match.group(1)), match.group(2)
+    return count * 12 if unit == "Y" else count
+
+
+# ------------------------
+# CAGR
+# ------------------------
+def latest_navs(df):
+    """First row on each scheme's latest date: SchemeID, Date, NAV."""
+    latest_date = df.groupby("SchemeID")["Date"].transform("max")
+    latest = df.loc[df["Date"] == latest_date, ["SchemeID", "Date", "NAV"]]
+    return latest.drop_duplicates("SchemeID").reset_index(drop=True)
+
+
+def nearest_navs(df, targets):
+    """
+    Sorted as-of join: for every (SchemeID, Target_Date) row in `targets`,
+    the NAV on that scheme's closest available date (earlier date on ties).
+    Returns `targets` with NAV and Nearest_Date columns, in the same order.
+    """
+    right = df[["SchemeID", "Date", "NAV"]].dropna(subset=["Date"]).sort_values("Date", kind="stable")
+    right = right.rename(columns={"Date": "Nearest_Date"})
+
+    left = targets.reset_index(drop=True)
+    left["_order"] = np.arange(len(left))
+    left = left.sort_values("Target_Date", kind="stable")
+
+    joined = pd.merge_asof(
+        left,
+        right.astype({"SchemeID": left["SchemeID"].dtype}),
+        left_on="Target_Date",
+        right_on="Nearest_Date",
+        by="SchemeID",
+        direction="nearest",
+    )
+    return joined.sort_values("_order").drop(columns="_order").reset_index(drop=True)
+
+
+def cagr_table(df, horizons=("1Y", "2Y"), as_of=None):
+    """
+    CAGR per SchemeID for each horizon label (e.g. '3M', '6M', '1Y', '2Y', '3Y').
+    The start NAV is the scheme's NAV closest to `as_of - horizon`, where
+    `as_of` defaults to the latest date in the dataset; the end NAV is the
+    scheme's latest NAV. Returns SchemeID plus one CAGR_<horizon> column each.
+    """
+    as_of = df["Date"].max() if as_of is None else pd.Timestamp(as_of)
+    latest = latest_navs(df)
+    result = latest[["SchemeID"]].copy()
+
+    targets = pd.concat(
+        [
+            pd.DataFrame({
+                "SchemeID": latest["SchemeID"],
+                "Horizon": horizon,
+                "Target_Date": as_of - pd.DateOffset(months=horizon_months(horizon)),
+            })
+            for horizon in horizons
+        ],
+        ignore_index=True,
+    )
+    start = nearest_navs(df, targets)
+
+    nav_latest = latest["NAV"].to_numpy()
+    for horizon in horizons:
+        nav_start = start.loc[start["Horizon"] == horizon, "NAV"].to_numpy()
+        years = horizon_months(horizon) / 12
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cagr = (nav_latest / nav_start) ** (1 / years) - 1
+        result[f"CAGR_{horizon}"] = np.where(nav_start > 0, cagr, np.nan)
+
+    return result
+
+
+# ------------------------
+# Grouped rolling statistics
+# ------------------------
+def group_bounds(ids):
+    """
+    Start positions of the scheme groups in `ids`. Groups must be contiguous
+    (the frame sorted by SchemeID, Date), otherwise a ValueError is raised.
+    """
+    ids = np.asarray(ids)
+    boundary = np.ones(len(ids), dtype=bool)
+    boundary[1:] = ids[1:] != ids[:-1]
+    starts = np.flatnonzero(boundary)
+    if len(np.unique(ids[starts])) != len(starts):
+        raise ValueError("❌ Rows are not grouped by scheme; sort by ['SchemeID', 'Date'] first.")
+    return starts
+
+
+def group_starts(ids):
+    """Position of the first row of each row's group (see group_bounds)."""
+    starts = group_bounds(ids)
+    return np.repeat(starts, np.diff(np.append(starts, len(ids))))
+
+
+class GroupedWindowIndexer(BaseIndexer):
+    """Trailing window of `window_size` rows that never reaches into the previous group."""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.group_start).astype(np.int64)
+        return start, end
+
+
+def rolling_stats(df, value_col="Daily_Return", windows=ROLLING_WINDOWS, stats=("std",)):
+    """
+    Trailing rolling statistics of `value_col` per scheme, for every window in
+    `windows` (name -> (window, min_periods)) and every stat in `stats`:
+      - std:      sample standard deviation, as rolling().std()
+      - mean:     rolling mean
+      - downside: sqrt of the mean squared negative value in the window,
+                  NaN when the window holds no negative values
+    Runs over the flat sorted column, so `df` must be sorted by SchemeID, Date.
+    The window restarts at every scheme boundary and needs `min_periods`
+    non-NaN values, exactly like groupby().transform(lambda x: x.rolling()).
+    Returns a frame aligned with `df`, one Rolling_<Stat>_<window name> column
+    per combination (e.g. Rolling_Volatility_21D).
+    """
+    starts = group_starts(df["SchemeID"].to_numpy())
+    values = pd.Series(df[value_col].to_numpy(dtype=float))
+    if "downside" in stats:
+        negative = values.where(values.isna() | (values < 0), 0.0)
+        is_negative = (negative < 0).astype(float)
+
+    result = {}
+    for name, (window, min_periods) in windows.items():
+        indexer = GroupedWindowIndexer(window_size=window, group_start=starts)
+        for stat in stats:
+            column = f"Rolling_{ROLLING_STATS[stat]}_{name}"
+            if stat == "std":
+                result[column] = values.rolling(indexer, min_periods=min_periods).std()
+            elif stat == "mean":
+                result[column] = values.rolling(indexer, min_periods=min_periods).mean()
+            elif stat == "downside":
+                squares = (negative ** 2).rolling(indexer, min_periods=min_periods).sum()
+                count = is_negative.rolling(indexer, min_periods=0).sum().round()
+                result[column] = np.sqrt(squares / count.where(count > 0))
+            else:
+                raise ValueError(f"❌ Unknown rolling statistic '{stat}'.")
+
+    return pd.DataFrame(result).set_axis(df.index)
+
+
+# ------------------------
+# Drawdown and downside deviation
+# ------------------------
+def downside_std(df, value_col="Daily_Return"):
+    """
+    Per-scheme root mean square of the negative values of `value_col`,
+    NaN for schemes without a negative value. Returns a Series by SchemeID.
+    """
+    values = df[value_col]
+    squares = values.where(values < 0) ** 2
+    return np.sqrt(squares.groupby(df["SchemeID"]).mean()).replace(0, np.nan)
+
+
+def drawdown_table(df):
+    """
+    Per-scheme maximum drawdown from the NAV path, for `df` sorted by
+    SchemeID, Date. Columns:
+      - Max_Drawdown:           most negative (NAV - running peak) / running peak
+      - Peak_Date, Trough_Date: last date at the peak before the worst trough,
+                                and the date of that trough
+      - Recovery_Date:          first date after the trough with NAV back at
+                                the peak, NaT while still under water
+      - Drawdown_Duration_Days: peak to recovery (or to the latest date)
+    Dates are NaT and the duration 0 for schemes that never fell below a peak.
+    """
+    ids = df["SchemeID"].to_numpy()
+    dates = df["Date"].to_numpy()
+    nav = df["NAV"].to_numpy(dtype=float)
+    positions = np.arange(len(nav), dtype=float)
+
+    starts = group_bounds(ids)
+    sizes = np.diff(np.append(starts, len(ids)))
+
+    def first_per_group(mask):
+        # Row position of the first True per group, NaN when there is none
+        return np.fmin.reduceat(np.where(mask, positions, np.nan), starts)
+
+    running_max = pd.Series(nav).groupby(np.repeat(np.arange(len(starts)), sizes)).cummax().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = (nav - running_max) / running_max
+    max_drawdown = np.fmin.reduceat(drawdown, starts)
+
+    # Latest row at the running peak; positions only grow, so a global running
+    # max never carries across groups for rows that have a drawdown
+    peak_pos = np.fmax.accumulate(np.where(nav == running_max, positions, np.nan))
+
+    trough = first_per_group(drawdown == np.repeat(max_drawdown, sizes))
+    has_drawdown = (max_drawdown < 0) & ~np.isnan(trough)
+    trough_pos = np.where(has_drawdown, trough, 0).astype("int64")
+    peak_at_trough = np.where(has_drawdown, peak_pos[trough_pos], 0).astype("int64")
+
+    # Recovery: first row after the trough whose NAV is back at the peak
+    recovered = (positions > np.repeat(trough_pos, sizes)) & (nav >= np.repeat(nav[peak_at_trough], sizes))
+    recovery = first_per_group(recovered & np.repeat(has_drawdown, sizes))
+    has_recovery = ~np.isnan(recovery)
+    recovery_pos = np.where(has_recovery, recovery, 0).astype("int64")
+
+    nat = np.datetime64("NaT")
+    result = pd.DataFrame({
+        "SchemeID": ids[starts],
+        "Max_Drawdown": max_drawdown,
+        "Peak_Date": np.where(has_drawdown, dates[peak_at_trough], nat),
+        "Trough_Date": np.where(has_drawdown, dates[trough_pos], nat),
+        "Recovery_Date": np.where(has_recovery, dates[recovery_pos], nat),
+    })
+    end = result["Recovery_Date"].fillna(pd.Series(dates[starts + sizes - 1]))
+    result["Drawdown_Duration_Days"] = (end - result["Peak_Date"]).dt.days.fillna(0).astype("int64")
+
+    return result
+
+
+# ------------------------
+# Period returns
+# ------------------------
+def period_keys(dates):
+    """
+    Integer month, quarter and year keys (counted from 1970) for a datetime64
+    array, plus the matching period start timestamps in the same unit.
+    """
+    months = dates.astype("datetime64[M]").astype("int64")
+    keys = {"Month": months, "Quarter": months // 3, "Year": months // 12}
+    starts = {
+        "Month": months,
+        "Quarter": keys["Quarter"] * 3,
+        "Year": keys["Year"] * 12,
+    }
+    starts = {name: start.astype("datetime64[M]").astype(dates.dtype) for name, start in starts.items()}
+    return keys, starts
+
+
+def period_returns(df, periods=PERIODS):
+    """
+    Monthly, quarterly and yearly returns in one pass. Sorts by SchemeID, Date
+    once (unless the rows already are), then for every (scheme, period) segment takes the first and last
+    non-NaN NAV and broadcasts (last - first) / first to the segment's rows.
+
+    Returns (rows, stds):
+      - rows: frame aligned with `df` holding the period start columns
+              (Month, Quarter, Year) and the period return columns
+      - stds: per-SchemeID sample std of each row-level return column
+              (Monthly_STD, Quarterly_STD, Yearly_STD)
+    """
+    ids = df["SchemeID"].to_numpy()
+    dates = df["Date"].to_numpy()
+    nav = df["NAV"].to_numpy(dtype=float)
+    in_order = ((ids[1:] > ids[:-1]) | ((ids[1:] == ids[:-1]) & (dates[1:] >= dates[:-1]))).all()
+    if not in_order:
+        order = np.lexsort((dates, ids))
+        ids, dates, nav = ids[order], dates[order], nav[order]
+    positions = np.arange(len(nav), dtype=float)
+    valid = np.where(np.isnan(nav), np.nan, positions)
+
+    scheme_starts = group_bounds(ids)
+    scheme_sizes = np.diff(np.append(scheme_starts, len(ids)))
+    keys, period_starts = period_keys(dates)
+
+    rows = {name: period_starts[name] for name in periods}
+    for name, (return_col, _) in periods.items():
+        # Segment = run of rows with the same scheme and period key
+        boundary = np.ones(len(ids), dtype=bool)
+        boundary[1:] = (ids[1:] != ids[:-1]) | (keys[name][1:] != keys[name][:-1])
+        starts = np.flatnonzero(boundary)
+        sizes = np.diff(np.append(starts, len(ids)))
+
+        first = np.fmin.reduceat(valid, starts)
+        last = np.fmax.reduceat(valid, starts)
+        has_nav = ~np.isnan(first)
+        start_nav = np.where(has_nav, nav[np.where(has_nav, first, 0).astype("int64")], np.nan)
+        end_nav = np.where(has_nav, nav[np.where(has_nav, last, 0).astype("int64")], np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rows[return_col] = np.repeat((end_nav - start_nav) / start_nav, sizes)
+
+    stds = {"SchemeID": ids[scheme_starts]}
+    for name, (return_col, std_col) in periods.items():
+        # Shift each scheme by its first valid value so constant columns give exactly 0
+        values = rows[return_col]
+        is_valid = ~np.isnan(values)
+        first = np.fmin.reduceat(np.where(is_valid, positions, np.nan), scheme_starts)
+        shift = np.where(np.isnan(first), 0.0, values[np.where(np.isnan(first), 0, first).astype("int64")])
+        values = values - np.repeat(shift, scheme_sizes)
+        count = np.add.reduceat(is_valid.astype("int64"), scheme_starts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.add.reduceat(np.where(is_valid, values, 0.0), scheme_starts) / count
+            squares = np.where(is_valid, values - np.repeat(mean, scheme_sizes), 0.0) ** 2
+            stds[std_col] = np.where(
+                count > 1, np.sqrt(np.add.reduceat(squares, scheme_starts) / (count - 1)), np.nan
+            )
+
+    # Back to the caller's row order
+    if not in_order:
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        rows = {col: values[inverse] for col, values in rows.items()}
+    rows = pd.DataFrame(rows, index=df.index)
+    return rows, pd.DataFrame(stds)
+
+
+# ------------------------
+# Latest-row features
+# ------------------------
+def latest_features(df, risk_free_rate=RISK_FREE_RATE):
+    """
+    Phase 2 features of the latest row of each scheme, from a SchemeID, Date,
+    NAV history: daily and period returns, period STDs, CAGR, Sharpe and
+    Sortino ratios, max drawdown and rolling volatility, with the same NaN
+    handling as phase 2. Returns one row per SchemeID.
+    """
+    df = df[["SchemeID", "Date", "NAV"]].sort_values(["SchemeID", "Date"]).reset_index(drop=True)
+    df["Daily_Return"] = df.groupby("SchemeID")["NAV"].pct_change()
+    period_df, period_std_df = period_returns(df)
+    rolling = rolling_stats(df, "Daily_Return", ROLLING_WINDOWS, ("std",))
+    rolling = rolling.groupby(df["SchemeID"]).ffill()
+    df = pd.concat([df, period_df[[return_col for return_col, _ in PERIODS.values()]], rolling], axis=1)
+
+    latest = df.groupby("SchemeID").tail(1)
+    latest = latest.merge(period_std_df, on="SchemeID", how="left")
+    latest = latest.merge(cagr_table(df, ("1Y", "2Y")), on="SchemeID", how="left")
+    latest = latest.merge(drawdown_table(df)[["SchemeID", "Max_Drawdown"]], on="SchemeID", how="left")
+    latest["Downside_STD"] = latest["SchemeID"].map(downside_std(df)).fillna(1e-6)
+
+    excess = latest["CAGR_1Y"] - risk_free_rate
+    latest["Sharpe_Ratio"] = (excess / latest["Yearly_STD"]).replace([np.inf, -np.inf], np.nan).fillna(0)
+    latest["Sortino_Ratio"] = (excess / latest["Downside_STD"]).replace([np.inf, -np.inf], np.nan)
+    return latest.reset_index(drop=True)
+
+
+# ------------------------
+# Reference implementations
+# ------------------------
+def reference_cagr_table(df):
+    """
+    The original per-scheme CAGR loop from phase2/2_phase.py (1Y and 2Y only).
+    When two dates are equally close to a cutoff, the unstable argsort picks
+    either one; cagr_table() always takes the earlier date.
+    """
+    df = df.sort_values(['SchemeID', 'Date'])
+    latest_date = df['Date'].max()
+    cutoff_1y = latest_date - pd.DateOffset(years=1)
+    cutoff_2y = latest_date - pd.DateOffset(years=2)
+
+    def get_closest_nav(df_sub, target_date):
+        return df_sub.iloc[(df_sub['Date'] - target_date).abs().argsort()[:1]]
+
+    cagr_data = []
+    for scheme_id, group in df.groupby('SchemeID'):
+        group = group.sort_values('Date')
+
+        latest_nav_row = group[group['Date'] == latest_date]
+        if latest_nav_row.empty:
+            latest_nav_row = group.iloc[[-1]]
+        nav_latest = latest_nav_row['NAV'].values[0]
+
+        nav_1y_row = get_closest_nav(group, cutoff_1y)
+        nav_2y_row = get_closest_nav(group, cutoff_2y)
+
+        nav_1y = nav_1y_row['NAV'].values[0] if not nav_1y_row.empty else np.nan
+        nav_2y = nav_2y_row['NAV'].values[0] if not nav_2y_row.empty else np.nan
+
+        cagr_1y = ((nav_latest / nav_1y) ** (1 / 1) - 1) if pd.notnull(nav_1y) and nav_1y > 0 else np.nan
+        cagr_2y = ((nav_latest / nav_2y) ** (1 / 2) - 1) if pd.notnull(nav_2y) and nav_2y > 0 else np.nan
+
+        cagr_data.append({
+            'SchemeID': scheme_id,
+            'CAGR_1Y': cagr_1y,
+            'CAGR_2Y': cagr_2y
+        })
+
+    return pd.DataFrame(cagr_data)
+
+
+def reference_rolling_volatility(df):
+    """The original per-scheme rolling std lambdas from phase2/2_phase.py."""
+    df = df.sort_values(['SchemeID', 'Date'])
+    result = pd.DataFrame(index=df.index)
+    for name, (window, min_periods) in ROLLING_WINDOWS.items():
+        result[f'Rolling_Volatility_{name}'] = (
+            df.groupby('SchemeID')['Daily_Return']
+            .transform(lambda x: x.rolling(window=window, min_periods=min_periods).std())
+        )
+    return result
+
+
+def reference_downside_std(df):
+    """The original robust_downside_std groupby-apply from phase2/2_phase.py."""
+    def robust_downside_std(returns):
+        negative_returns = returns[returns < 0]
+        if len(negative_returns) == 0:
+            return np.nan
+        return np.sqrt((negative_returns ** 2).mean())
+
+    return df.groupby("SchemeID")["Daily_Return"].apply(robust_downside_std).replace(0, np.nan)
+
+
+def reference_max_drawdown(df):
+    """The original calculate_max_drawdown groupby-apply from phase2/2_phase.py."""
+    def calculate_max_drawdown(nav_series):
+        running_max = nav_series.cummax()
+        drawdown = (nav_series - running_max) / running_max
+        return drawdown.min()
+
+    return df.groupby('SchemeID')['NAV'].apply(calculate_max_drawdown)
+
+
+def reference_period_returns(df):
+    """
+    The original add_period_return path from phase2/2_phase.py: to_period
+    columns, one sort and two groupby transforms per period, then a groupby
+    std per return column. Returns the same (rows, stds) pair as period_returns().
+    """
+    df = df.copy()
+    df['Month'] = df['Date'].dt.to_period('M')
+    df['Quarter'] = df['Date'].dt.to_period('Q')
+    df['Year'] = df['Date'].dt.to_period('Y')
+
+    def add_period_return(df, period_col, return_col_name):
+        df_sorted = df.sort_values(['SchemeID', 'Date'])
+        grouped = df_sorted.groupby(['SchemeID', period_col])
+        start_nav = grouped['NAV'].transform('first')
+        end_nav = grouped['NAV'].transform('last')
+        df[return_col_name] = (end_nav - start_nav) / start_nav
+        return df
+
+    stds = None
+    for period_col, (return_col, std_col) in PERIODS.items():
+        df = add_period_return(df, period_col, return_col)
+        df[period_col] = df[period_col].dt.to_timestamp()
+        period_std = df.groupby("SchemeID")[return_col].std().reset_index()
+        period_std.columns = ["SchemeID", std_col]
+        stds = period_std if stds is None else stds.merge(period_std, on="SchemeID")
+
+    columns = list(PERIODS) + [return_col for return_col, _ in PERIODS.values()]
+    return df[columns], stds
@@ -0,0 +1,145 @@
+"""
+Headless outlier treatment for phase 3.
+
+Winsorization bounds for every configured column come from one partition
+pass over the feature matrix, with the same index rules as
+scipy.stats.mstats.winsorize, so the transformed columns are unchanged.
+The bounds are saved next to the phase 3 output so live schemes can be
+transformed the same way later. Isolation Forest outlier counts are
+estimated from models fitted on a bounded sample, one column per core, and
+reported as a summary table instead of per-column plots.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import IsolationForest
+
+
+WINSORIZE_LIMITS = (0.03, 0.03)
+
+# Phase 3 transforms in output column order: (column, "log" | "winsorize")
+PHASE3_TRANSFORMS = [
+    ("NAV", "log"),
+    ("Daily_Return", "winsorize"),
+    ("Monthly_Return", "winsorize"),
+    ("Quarterly_Return", "winsorize"),
+    ("Yearly_Return", "winsorize"),
+    ("Monthly_STD", "winsorize"),
+    ("Quarterly_STD", "winsorize"),
+    ("Yearly_STD", "winsorize"),
+    ("CAGR_1Y", "winsorize"),
+    ("CAGR_2Y", "winsorize"),
+    ("Sharpe_Ratio", "log"),
+    ("Sortino_Ratio", "log"),
+    ("Max_Drawdown", "winsorize"),
+    ("Rolling_Volatility_21D", "winsorize"),
+    ("Rolling_Volatility_Quarter", "winsorize"),
+    ("Rolling_Volatility_Year", "winsorize"),
+]
+TRANSFORM_SUFFIX = {"log": "_log_normalize", "winsorize": "_winsorized"}
+
+
+def transformed_name(column, kind):
+    return f"{column}{TRANSFORM_SUFFIX[kind]}"
+
+
+def winsorized_columns(transforms=PHASE3_TRANSFORMS):
+    return [column for column, kind in transforms if kind == "winsorize"]
+
+
+# ------------------------
+# Winsorization
+# ------------------------
+def winsorize_bounds(df, columns, limits=WINSORIZE_LIMITS):
+    """
+    Lower and upper clipping values per column, as scipy's mstats.winsorize
+    picks them: the order statistics at int(low * n) and n - int(n * up) - 1.
+    All columns are partitioned together in one pass; they are expected to be
+    NaN-free (phase 3 drops NaN rows first).
+    Returns a DataFrame indexed by column with lower and upper.
+    """
+    low, up = limits
+    values = df[columns].to_numpy(dtype=float)
+    n = len(values)
+    low_idx = int(low * n)
+    up_idx = n - int(n * up) - 1
+    ordered = np.partition(values, sorted({low_idx, up_idx}), axis=0)
+    return pd.DataFrame(
+        {"lower": ordered[low_idx], "upper": ordered[up_idx]},
+        index=pd.Index(columns, name="column"),
+    )
+
+
+def apply_transforms(df, bounds, transforms=PHASE3_TRANSFORMS):
+    """
+    Adds the phase 3 columns: log1p for "log" columns and clipping to
+    `bounds` for "winsorize" columns. Works on any frame with the source
+    columns, e.g. live schemes scored with bounds saved by phase 3.
+    """
+    new_columns = {}
+    for column, kind in transforms:
+        if kind == "log":
+            new_columns[transformed_name(column, kind)] = np.log1p(df[column])
+        else:
+            lower, upper = bounds.loc[column, ["lower", "upper"]]
+            new_columns[transformed_name(column, kind)] = df[column].clip(lower, upper)
+    return df.assign(**new_columns)
+
+
+def save_bounds(bounds, path, limits=WINSORIZE_LIMITS):
+    with open(path, "w") as f:
+        json.dump({
+            "limits": list(limits),
+            "bounds": {column: [row.lower, row.upper] for column, row in bounds.iterrows()},
+        }, f, indent=2)
+    print(f"✅ Winsorization bounds saved to: {path}")
+
+
+def load_bounds(path):
+    with open(path) as f:
+        saved = json.load(f)
+    bounds = pd.DataFrame.from_dict(saved["bounds"], orient="index", columns=["lower", "upper"])
+    bounds.index.name = "column"
+    return bounds
+
+
+# ------------------------
+# Outlier summary
+# ------------------------
+def _isolation_forest_share(values, contamination, random_state):
+    iso = IsolationForest(contamination=contamination, random_state=random_state)
+    return float((iso.fit_predict(values.reshape(-1, 1)) == -1).mean())
+
+
+def outlier_summary(df, columns, bounds=None, sample_size=50_000, contamination=0.01,
+                    n_jobs=-1, random_state=42):
+    """
+    Per-column summary statistics plus Isolation Forest outlier estimates.
+    One single-feature forest per column is fitted on the same random sample
+    of at most `sample_size` rows, in parallel; its outlier share on the
+    sample is scaled to the full row count. With `bounds`, also counts the
+    rows clipped at each end by winsorization.
+    """
+    sample = df[columns]
+    if len(sample) > sample_size:
+        sample = sample.sample(n=sample_size, random_state=random_state)
+    sample = sample.to_numpy(dtype=float)
+
+    shares = Parallel(n_jobs=n_jobs)(
+        delayed(_isolation_forest_share)(sample[:, j], contamination, random_state)
+        for j in range(len(columns))
+    )
+
+    values = df[columns]
+    summary = values.describe(percentiles=[0.01, 0.03, 0.5, 0.97, 0.99]).T
+    summary["iforest_outlier_share"] = shares
+    summary["iforest_outliers_est"] = (summary["iforest_outlier_share"] * len(df)).round().astype("int64")
+    if bounds is not None:
+        clipped = bounds.reindex(columns)
+        summary["clipped_low"] = (values < clipped["lower"]).sum().where(clipped["lower"].notna())
+        summary["clipped_high"] = (values > clipped["upper"]).sum().where(clipped["upper"].notna())
+    summary.index.name = "column"
+    return summary
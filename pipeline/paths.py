@@ -0,0 +1,50 @@
+"""
+Data file locations shared by the phase scripts and the pipeline runner.
+
+Every phase script keeps its original hard-coded path as the default and
+takes an override from an MF_<NAME> environment variable, so the same
+scripts run by hand (Windows / Colab paths) or from pipeline/runner.py,
+which points all of them at one data directory.
+"""
+
+import os
+
+
+DATA_FILES = {
+    "all_funds_nav": "all-funds-nav.csv",
+    "after_phase_1": "after_phase_1.csv",
+    "after_phase_2": "after_phase_2.csv",
+    "after_phase_2_drawdowns": "after_phase_2_drawdowns.csv",
+    "scheme_categories": "amfi_scheme_categories.csv",
+    "scheme_classes": "scheme_classes.csv",
+    "after_phase_2_categorized": "after_phase_2_with_categorization.csv",
+    "after_phase_2_balanced": "after_phase_2_with_balance.csv",
+    "winsorize_bounds": "phase3_winsorize_bounds.json",
+    "outlier_summary": "phase3_outlier_summary.csv",
+    "after_phase_3": "AFTER_PHASE_3(transformation).csv",
+    "clustered": "df_clustered_phase_5_final.csv",
+    "risk_model": "random_forest_risk_classifier_final.pkl",
+    "risk_model_compact": "random_forest_risk_classifier_final_compact",
+    "scaler": "scaler_for_rf_model_final.pkl",
+    "pca": "PCA_transformer_final.pkl",
+    "kmeans": "KMeans_model_final.pkl",
+    "phase5": "phase5_processed_funds_data_final.csv",
+    "cluster_selection": "cluster_selection_report.csv",
+    "incremental_state": "incremental_state",
+}
+
+
+def env_var(name):
+    return f"MF_{name.upper()}"
+
+
+def data_path(name, default):
+    """MF_<NAME> from the environment, else the script's own default path."""
+    if name not in DATA_FILES:
+        raise ValueError(f"❌ Unknown data file '{name}', expected one of {list(DATA_FILES)}")
+    return os.environ.get(env_var(name)) or default
+
+
+def data_env(data_dir):
+    """MF_<NAME> variables pointing every data file at `data_dir`."""
+    return {env_var(name): os.path.join(data_dir, file_name) for name, file_name in DATA_FILES.items()}
@@ -0,0 +1,105 @@
+"""
+Risk clustering for phases 4-5.
+
+Most of the phase 4-5 features (Yearly_STD, CAGR_1Y, Max_Drawdown, ...)
+are per-scheme values repeated on every daily row, so clustering the rows
+fits millions of near-duplicate points and can split one scheme across
+risk clusters. Here the rows can be aggregated first, to one feature
+vector per SchemeID or per (SchemeID, month), and the cluster labels
+broadcast back to the rows. Row-level clustering stays the default (see
+DEFAULT_CLUSTER_LEVEL), with MiniBatchKMeans as a faster alternative to
+full KMeans.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+
+# Set 5 features (pure volatility + downside)
+RISK_FEATURES = [
+    "Yearly_Return_winsorized",
+    "Monthly_Return_winsorized", "Yearly_STD_winsorized",
+    "Monthly_STD_winsorized",
+    "Max_Drawdown_winsorized",
+    "Sharpe_Ratio_log_normalize", "CAGR_1Y_winsorized",
+]
+RISK_MAP = {0: "Low", 1: "Medium", 2: "High"}
+
+CLUSTER_LEVELS = ("row", "scheme", "scheme_month")
+# Level of the phase 4-5 production fit. Cluster ids are mapped to risk levels
+# through RISK_MAP as they come out of k-means, so the other levels are opt-in.
+DEFAULT_CLUSTER_LEVEL = "row"
+CLUSTER_ALGORITHMS = ("kmeans", "minibatch")
+
+
+# ------------------------
+# Aggregation
+# ------------------------
+def cluster_keys(df, level):
+    """Key columns for one clustering unit at `level`, aligned to df.index."""
+    if level == "row":
+        return None
+    if level == "scheme":
+        return df[["SchemeID"]]
+    if level == "scheme_month":
+        months = df["Date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype("int64")
+        return pd.DataFrame({"SchemeID": df["SchemeID"].to_numpy(), "MonthKey": months}, index=df.index)
+    raise ValueError(f"❌ Unknown cluster level '{level}', expected one of {CLUSTER_LEVELS}")
+
+
+def aggregate_features(df, features=RISK_FEATURES, level="scheme"):
+    """
+    One feature vector per clustering unit: the mean of each feature over
+    the unit's rows (rows with a missing feature are dropped first).
+    Returns (X, unit_ids): X indexed by the unit keys, and unit_ids giving
+    each kept row's position in X, aligned to the kept rows of df.
+    """
+    rows = df[features].dropna()
+    keys = cluster_keys(df.loc[rows.index], level)
+    if keys is None:
+        return rows, pd.Series(np.arange(len(rows)), index=rows.index)
+
+    key_cols = list(keys.columns)
+    X = pd.concat([keys, rows], axis=1).groupby(key_cols, sort=True).mean()
+    unit_ids = X.index.get_indexer(keys.iloc[:, 0] if len(key_cols) == 1 else pd.MultiIndex.from_frame(keys))
+    return X, pd.Series(unit_ids, index=rows.index)
+
+
+# ------------------------
+# Fitting
+# ------------------------
+def make_clusterer(n_clusters=3, algorithm="kmeans", random_state=42, batch_size=4096):
+    if algorithm == "kmeans":
+        return KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
+    if algorithm == "minibatch":
+        return MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3,
+                               batch_size=batch_size)
+    raise ValueError(f"❌ Unknown cluster algorithm '{algorithm}', expected one of {CLUSTER_ALGORITHMS}")
+
+
+def fit_risk_clusters(X, n_clusters=3, n_components=2, algorithm="kmeans", random_state=42):
+    """
+    StandardScaler -> PCA -> k-means on the feature matrix X.
+    Returns (scaler, pca, clusterer, X_pca, labels).
+    """
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    pca = PCA(n_components=n_components, random_state=random_state)
+    X_pca = pca.fit_transform(X_scaled)
+    clusterer = make_clusterer(n_clusters, algorithm, random_state)
+    labels = clusterer.fit_predict(X_pca)
+    return scaler, pca, clusterer, X_pca, labels
+
+
+def broadcast_labels(unit_labels, unit_ids):
+    """Per-row cluster labels from per-unit labels, aligned to unit_ids.index."""
+    return pd.Series(np.asarray(unit_labels)[unit_ids.to_numpy()], index=unit_ids.index)
+
+
+def scheme_purity(scheme_ids, row_labels):
+    """Share of schemes whose rows all fall in a single cluster."""
+    clusters_per_scheme = pd.Series(np.asarray(row_labels)).groupby(np.asarray(scheme_ids)).nunique()
+    return float((clusters_per_scheme == 1).mean())
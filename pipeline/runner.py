@@ -0,0 +1,342 @@
+"""
+Runs phases 1-5 as a DAG of stages with content-hashed caching.
+
+Each stage is one phase script (or pipeline module) with declared input
+and output data files (names from pipeline/paths.py). A stage's key is
+the SHA-256 of its input files, its script and the pipeline modules the
+script imports (where parameters such as WINSORIZE_LIMITS or
+CLUSTER_LEVEL live) and its command-line arguments. A stage whose key and
+outputs match the last successful run is skipped, so a change to the
+phase 3 winsorization limits re-runs phase 3 and what reads its output,
+not phases 1 and 2. A re-run whose output comes out byte-identical does
+not re-run the stages after it either.
+
+Stages whose inputs are ready run concurrently, each in its own process
+(the script's directory as working directory, MPLBACKEND=Agg so plt.show
+does not block, output in <data dir>/.pipeline_logs/<stage>.log). Keys,
+output hashes and a (size, mtime) -> hash cache, so unchanged multi-GB
+files are not re-read, are kept in <data dir>/.pipeline_state.json.
+
+    python -m pipeline --data-dir /data/Mutual_funds
+    python -m pipeline --data-dir /data/Mutual_funds phase3 --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pipeline.paths import DATA_FILES, data_env, env_var
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_FILE = ".pipeline_state.json"
+LOG_DIR = ".pipeline_logs"
+HASH_BLOCK = 1 << 20
+
+PIPELINE_IMPORT = re.compile(r"^\s*(?:from|import)\s+pipeline\.(\w+)", re.MULTILINE)
+
+
+class Stage:
+    """
+    One pipeline step. `script` is a path relative to the repo root and is
+    run from its own directory; `module` is run with python -m from the repo
+    root, with {name} placeholders in `args` replaced by data file paths.
+    Inputs in `optional` may be missing.
+    """
+
+    def __init__(self, name, inputs, outputs, script=None, module=None, args=(), optional=()):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.script = script
+        self.module = module
+        self.args = list(args)
+        self.optional = set(optional)
+
+    def source(self):
+        if self.script is not None:
+            return os.path.join(REPO_ROOT, self.script)
+        return os.path.join(REPO_ROOT, *self.module.split(".")) + ".py"
+
+    def command(self, paths):
+        if self.script is not None:
+            return [sys.executable, os.path.basename(self.script)], os.path.dirname(self.source())
+        args = [arg.format(**paths) for arg in self.args]
+        return [sys.executable, "-m", self.module] + args, REPO_ROOT
+
+
+# scheme_classes.csv is 2_1's classification cache: it only saves work, the
+# categorized output is the same without it, so it is not a declared input.
+STAGES = [
+    Stage("phase1", ["all_funds_nav"], ["after_phase_1"], script="phase1/1.py"),
+    Stage("phase2", ["after_phase_1"], ["after_phase_2", "after_phase_2_drawdowns"],
+          script="phase2/2_phase.py"),
+    Stage("categorize", ["after_phase_2", "scheme_categories"], ["after_phase_2_categorized"],
+          script="phase2/2_1.py", optional=["scheme_categories"]),
+    Stage("balance", ["after_phase_2_categorized"], ["after_phase_2_balanced"], script="phase2/2_2.py"),
+    Stage("phase3", ["after_phase_2_balanced"], ["after_phase_3", "winsorize_bounds", "outlier_summary"],
+          script="phase3/new_phase3.py"),
+    Stage("phase4_5", ["after_phase_3"],
+          ["clustered", "risk_model", "risk_model_compact", "scaler", "pca", "kmeans", "phase5"],
+          script="phase4-5/new_phase_4_5.py"),
+    Stage("cluster_selection", ["after_phase_3"], ["cluster_selection"], module="pipeline.cluster_selection",
+          args=["{after_phase_3}", "--report", "{cluster_selection}"]),
+]
+
+
+# ------------------------
+# Hashing
+# ------------------------
+def code_files(path):
+    """`path` and every pipeline module it imports, directly or through other pipeline modules."""
+    seen, pending = [], [path]
+    while pending:
+        current = pending.pop()
+        if current in seen or not os.path.exists(current):
+            continue
+        seen.append(current)
+        with open(current, encoding="utf-8") as f:
+            modules = PIPELINE_IMPORT.findall(f.read())
+        pending.extend(os.path.join(REPO_ROOT, "pipeline", f"{module}.py") for module in modules)
+    return sorted(seen)
+
+
+class FileHasher:
+    """SHA-256 of files and directories, re-read only when size or mtime changed."""
+
+    def __init__(self, cache=None):
+        self.cache = dict(cache or {})
+        self._lock = threading.Lock()
+
+    def _file(self, path):
+        stat = os.stat(path)
+        fingerprint = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            cached = self.cache.get(path)
+        if cached is not None and cached[:2] == fingerprint:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                digest.update(block)
+        with self._lock:
+            self.cache[path] = fingerprint + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def __call__(self, path):
+        """Hash of a file, of a directory's files, or None when the path is missing."""
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for name in sorted(os.listdir(path)):
+                digest.update(f"{name}:{self(os.path.join(path, name))}".encode())
+            return digest.hexdigest()
+        if not os.path.exists(path):
+            return None
+        return self._file(path)
+
+
+def stage_key(stage, paths, hasher):
+    parts = {
+        "inputs": {name: hasher(paths[name]) for name in stage.inputs},
+        "code": {os.path.relpath(path, REPO_ROOT): hasher(path) for path in code_files(stage.source())},
+        "args": stage.args,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# ------------------------
+# Runner
+# ------------------------
+def resolve_paths(data_dir):
+    """Data file paths: MF_<NAME> when set, else the file in `data_dir`."""
+    defaults = data_env(data_dir)
+    return {name: os.environ.get(env_var(name)) or defaults[env_var(name)] for name in DATA_FILES}
+
+
+def upstream(stages):
+    """Stage name -> names of the stages producing its inputs."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {
+        stage.name: {producers[name] for name in stage.inputs if name in producers} - {stage.name}
+        for stage in stages
+    }
+
+
+def select(stages, targets):
+    """The target stages and everything upstream of them, in declaration order."""
+    if not targets:
+        return list(stages)
+    names = {stage.name for stage in stages}
+    unknown = set(targets) - names
+    if unknown:
+        raise ValueError(f"❌ Unknown stages {sorted(unknown)}, expected some of {sorted(names)}")
+    deps = upstream(stages)
+    wanted, pending = set(), list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+
+class PipelineRunner:
+    def __init__(self, data_dir, stages=STAGES, jobs=None, force=()):
+        self.data_dir = os.path.abspath(data_dir)
+        self.stages = list(stages)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.force = set(force)
+        self.paths = resolve_paths(self.data_dir)
+        self.state_path = os.path.join(self.data_dir, STATE_FILE)
+        self.log_dir = os.path.join(self.data_dir, LOG_DIR)
+        self.state = self._load_state()
+        self.hasher = FileHasher(self.state.get("files"))
+        self._lock = threading.Lock()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {"stages": {}, "files": {}}
+
+    def _save_state(self):
+        with self._lock:
+            self.state["files"] = dict(self.hasher.cache)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.state_path)
+
+    def _check_inputs(self, stage):
+        missing = [self.paths[name] for name in stage.inputs
+                   if name not in stage.optional and not os.path.exists(self.paths[name])]
+        if missing:
+            raise ValueError(f"❌ Stage '{stage.name}' is missing inputs: {missing}")
+
+    def is_current(self, stage, key):
+        """True when the last successful run had this key and its outputs are unchanged."""
+        if stage.name in self.force:
+            return False
+        record = self.state["stages"].get(stage.name)
+        if record is None or record["key"] != key:
+            return False
+        return all(self.hasher(self.paths[name]) == record["outputs"].get(name) for name in stage.outputs)
+
+    def _execute(self, stage):
+        command, cwd = stage.command(self.paths)
+        env = dict(os.environ, MPLBACKEND="Agg", PYTHONPATH=os.pathsep.join(
+            filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+        env.update({env_var(name): path for name, path in self.paths.items()})
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_path = os.path.join(self.log_dir, f"{stage.name}.log")
+        with open(log_path, "w", encoding="utf-8") as log:
+            returncode = subprocess.call(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if returncode != 0:
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                tail = "".join(log.readlines()[-20:])
+            raise RuntimeError(f"❌ Stage '{stage.name}' failed (exit {returncode}), log: {log_path}\n{tail}")
+
+    def run_stage(self, stage):
+        """Runs one stage unless it is current. Returns "skipped" or "ran"."""
+        self._check_inputs(stage)
+        key = stage_key(stage, self.paths, self.hasher)
+        if self.is_current(stage, key):
+            print(f"⏭️ {stage.name}: inputs unchanged, skipped")
+            return "skipped"
+
+        print(f"🔁 {stage.name}: running")
+        start = time.perf_counter()
+        self._execute(stage)
+        outputs = {name: self.hasher(self.paths[name]) for name in stage.outputs}
+        missing = [self.paths[name] for name, digest in outputs.items() if digest is None]
+        if missing:
+            raise RuntimeError(f"❌ Stage '{stage.name}' did not write: {missing}")
+        with self._lock:
+            self.state["stages"][stage.name] = {"key": key, "outputs": outputs, "finished": time.time()}
+        self._save_state()
+        print(f"✅ {stage.name}: done in {time.perf_counter() - start:.1f} s")
+        return "ran"
+
+    def plan(self):
+        """Stage name -> "run" / "skip" from the current files, without running anything."""
+        deps = upstream(self.stages)
+        plan = {}
+        for stage in self.stages:
+            if any(plan.get(name) == "run" for name in deps[stage.name]):
+                plan[stage.name] = "run"
+                continue
+            key = stage_key(stage, self.paths, self.hasher)
+            plan[stage.name] = "skip" if self.is_current(stage, key) else "run"
+        return plan
+
+    def run(self):
+        """
+        Runs the stages as their upstream stages finish, up to `jobs` at a
+        time. Stages downstream of a failure are not started. Returns
+        stage name -> "ran" / "skipped" / "failed" / "blocked".
+        """
+        deps = upstream(self.stages)
+        results, futures = {}, {}
+        pending = list(self.stages)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or futures:
+                for stage in list(pending):
+                    states = [results.get(name) for name in deps[stage.name]]
+                    if any(state in ("failed", "blocked") for state in states):
+                        results[stage.name] = "blocked"
+                        pending.remove(stage)
+                    elif all(state in ("ran", "skipped") for state in states):
+                        futures[pool.submit(self.run_stage, stage)] = stage.name
+                        pending.remove(stage)
+                if not futures:
+                    continue
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except (RuntimeError, ValueError, OSError) as e:
+                        results[name] = "failed"
+                        print(e)
+        self._save_state()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline phases 1-5, skipping unchanged stages.")
+    parser.add_argument("stages", nargs="*", help="Stages to bring up to date (default: all), with their upstream")
+    parser.add_argument("--data-dir", default=os.getenv("MF_DATA_DIR", "."),
+                        help="Directory holding the data files (MF_<NAME> overrides single files)")
+    parser.add_argument("--jobs", type=int, help="Stages run at once (default: CPU count)")
+    parser.add_argument("--force", nargs="+", default=[], help="Re-run these stages even when current")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages would run")
+    parser.add_argument("--list", action="store_true", help="List the stages and their data files")
+    args = parser.parse_args()
+
+    stages = select(STAGES, args.stages)
+    runner = PipelineRunner(args.data_dir, stages, jobs=args.jobs, force=args.force)
+    if args.list:
+        for stage in stages:
+            print(f"{stage.name:<18} {', '.join(stage.inputs)} -> {', '.join(stage.outputs)}")
+        return
+    if args.dry_run:
+        for name, action in runner.plan().items():
+            print(f"{name:<18} {action}")
+        return
+
+    results = runner.run()
+    print("📌 " + ", ".join(f"{name}: {state}" for name, state in results.items()))
+    sys.exit(0 if all(state in ("ran", "skipped") for state in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Columnar snapshots of the files handed between pipeline phases.
+
+Every phase output CSV can have a sibling ``.feather`` file (uncompressed
+Arrow IPC) holding the same table with explicit dtypes. Readers memory-map
+the file and load only the columns they ask for; ``read_table`` prefers the
+snapshot and falls back to the CSV when there is none or it is older.
+
+    python -m pipeline.snapshot convert after_phase_2.csv phase5_processed_funds_data_final.csv
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+
+SNAPSHOT_SUFFIX = ".feather"
+
+DATE_COLUMNS = ["Date", "Month", "Quarter", "Year"]
+CATEGORICAL_COLUMNS = [
+    "Fund House", "Scheme", "AssetClass", "MarketCap",
+    "Balanced_AssetClass", "Balanced_MarketCap", "Risk_Level",
+]
+
+
+def snapshot_path(path):
+    """Returns the snapshot path that sits next to a CSV path."""
+    return os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+
+
+def source_path(path):
+    """Returns the file read_table() would read for `path`."""
+    snap = snapshot_path(path)
+    if not os.path.exists(snap):
+        return path
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(snap):
+        return path
+    return snap
+
+
+def normalize_dtypes(df):
+    """
+    Gives known columns explicit dtypes: dates become datetime64, repeated
+    text labels become categoricals. Numeric columns are left as they are.
+    """
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def write_snapshot(df, path):
+    """Writes df as an uncompressed Feather file next to `path` (a CSV or snapshot path)."""
+    target = snapshot_path(path)
+    normalize_dtypes(df).reset_index(drop=True).to_feather(target, compression="uncompressed")
+    print(f"✅ Snapshot saved to: {target}")
+    return target
+
+
+def read_snapshot(path, columns=None):
+    """Memory-maps a snapshot and loads only `columns` (all when None)."""
+    from pyarrow import feather
+
+    table = feather.read_table(snapshot_path(path), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def read_table(path, columns=None, parse_dates=None, **csv_kwargs):
+    """
+    Loads a phase output, preferring its snapshot. Without a current
+    snapshot (or without pyarrow) the CSV is read with the same columns.
+    """
+    if source_path(path) != path:
+        try:
+            return read_snapshot(path, columns)
+        except ImportError:
+            pass
+
+    if parse_dates and columns is not None:
+        parse_dates = [col for col in parse_dates if col in columns]
+    return pd.read_csv(path, usecols=columns, parse_dates=parse_dates or None, **csv_kwargs)
+
+
+def iter_table(path, columns=None, chunksize=500_000, parse_dates=None, **csv_kwargs):
+    """
+    Yields a phase output in DataFrame chunks of at most `chunksize` rows,
+    like read_table(). A snapshot is memory-mapped and sliced, so only the
+    current chunk is materialized; a CSV is read with pandas' chunked reader.
+    """
+    if source_path(path) != path:
+        try:
+            from pyarrow import feather
+        except ImportError:
+            pass
+        else:
+            table = feather.read_table(snapshot_path(path), columns=columns, memory_map=True)
+            for offset in range(0, table.num_rows, chunksize):
+                yield table.slice(offset, chunksize).to_pandas()
+            return
+
+    if parse_dates and columns is not None:
+        parse_dates = [col for col in parse_dates if col in columns]
+    yield from pd.read_csv(path, usecols=columns, parse_dates=parse_dates or None,
+                           chunksize=chunksize, **csv_kwargs)
+
+
+def convert_csv(path):
+    """Writes the snapshot for an existing CSV file."""
+    df = pd.read_csv(path, low_memory=False)
+    return write_snapshot(df, path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "convert":
+        sys.exit("usage: python -m pipeline.snapshot convert FILE.csv [FILE.csv ...]")
+    for csv_path in sys.argv[2:]:
+        convert_csv(csv_path)
@@ -0,0 +1,267 @@
+"""
+Out-of-core fitting of the phase 4-5 scaler, PCA and k-means.
+
+Phase 4-5 loads the whole AFTER_PHASE_3 table and calls fit_transform on
+each estimator, which caps the training history at what fits in RAM.
+Here the table is streamed in chunks (memory-mapped snapshot slices, or
+chunked CSV reads), so peak memory depends on the chunk size, not on
+the number of rows:
+
+- row level: StandardScaler, IncrementalPCA and MiniBatchKMeans are
+  updated with partial_fit, with one pass over the data per estimator.
+- scheme / scheme_month level: per-unit feature sums and counts are
+  accumulated chunk by chunk. The small per-unit matrix is then fitted
+  in memory exactly like risk_model.fit_risk_clusters.
+
+The fitted estimators are saved under the phase 4-5 artifact names with
+joblib, at the same default level as phase 4-5 (DEFAULT_CLUSTER_LEVEL).
+The incremental PCA fit is saved as a plain PCA object, so
+PCA_transformer_final.pkl has the same type whichever path wrote it; the
+row-level k-means is a MiniBatchKMeans with the same predict API. The row
+labels are streamed to a CSV.
+
+    python -m pipeline.streaming_fit "AFTER_PHASE_3(transformation).csv" --out-dir models --level row
+"""
+
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+from pipeline.risk_model import (
+    CLUSTER_LEVELS, DEFAULT_CLUSTER_LEVEL, RISK_FEATURES, RISK_MAP, cluster_keys, fit_risk_clusters
+)
+from pipeline.snapshot import iter_table
+
+
+FILL_MEDIAN_COLUMNS = ["Sharpe_Ratio_log_normalize", "Sortino_Ratio_log_normalize"]
+SAMPLE_SIZE = 200_000
+
+ARTIFACT_NAMES = {
+    "scaler": "scaler_for_rf_model_final.pkl",
+    "pca": "PCA_transformer_final.pkl",
+    "kmeans": "KMeans_model_final.pkl",
+}
+
+
+# ------------------------
+# Chunk sources
+# ------------------------
+def chunk_source(path, features=RISK_FEATURES, chunksize=500_000):
+    """Returns a callable that starts a new pass over (SchemeID, Date, features) chunks."""
+    columns = ["SchemeID", "Date"] + list(dict.fromkeys(list(features) + FILL_MEDIAN_COLUMNS))
+
+    def chunks():
+        for chunk in iter_table(path, columns=columns, chunksize=chunksize, parse_dates=["Date"]):
+            chunk["Date"] = pd.to_datetime(chunk["Date"], errors="coerce")
+            yield chunk
+    return chunks
+
+
+def sample_rows(chunks, sample_size=SAMPLE_SIZE, random_state=42):
+    """
+    Uniform random sample of at most `sample_size` rows in one pass (bottom-k
+    on random keys, so the sample does not favour any chunk). The whole
+    table when it has no more rows than the sample.
+    """
+    rng = np.random.default_rng(random_state)
+    keys, sample = None, None
+    for chunk in chunks():
+        if sample is None:
+            keys, sample = rng.random(len(chunk)), chunk.reset_index(drop=True)
+        else:
+            keys = np.concatenate([keys, rng.random(len(chunk))])
+            sample = pd.concat([sample, chunk], ignore_index=True)
+        if len(sample) > sample_size:
+            keep = np.sort(np.argpartition(keys, sample_size)[:sample_size])
+            keys, sample = keys[keep], sample.iloc[keep].reset_index(drop=True)
+    return sample
+
+
+def prepared_chunks(chunks, medians, features=RISK_FEATURES):
+    """Chunks with the phase 4-5 median fill applied and incomplete feature rows dropped."""
+    for chunk in chunks():
+        chunk = chunk.fillna(medians.to_dict())
+        yield chunk.dropna(subset=list(features))
+
+
+def minibatches(values, batch_size):
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+
+# ------------------------
+# Fitting
+# ------------------------
+def truncate_pca(pca, n_components):
+    """
+    Keeps the leading `n_components` of a fitted (Incremental)PCA. Fitting
+    all components and truncating afterwards keeps the incremental fit
+    exact; truncating inside every partial_fit drifts on ordered data.
+    """
+    pca.noise_variance_ = pca.explained_variance_[n_components:].mean() if pca.n_components_ > n_components else 0.0
+    for attr in ("components_", "explained_variance_", "explained_variance_ratio_", "singular_values_"):
+        setattr(pca, attr, getattr(pca, attr)[:n_components])
+    pca.n_components = pca.n_components_ = n_components
+    return pca
+
+
+def as_pca(incremental_pca):
+    """
+    A fitted PCA holding an (Incremental)PCA's fit, so PCA_transformer_final.pkl
+    stays a PCA whichever path wrote it. transform() is the same projection.
+    """
+    pca = PCA(n_components=incremental_pca.n_components_)
+    for attr in ("components_", "explained_variance_", "explained_variance_ratio_", "singular_values_",
+                 "mean_", "noise_variance_", "n_components_", "n_features_in_"):
+        setattr(pca, attr, getattr(incremental_pca, attr))
+    pca.n_samples_ = int(getattr(incremental_pca, "n_samples_seen_", getattr(incremental_pca, "n_samples_", 0)))
+    return pca
+
+
+def fit_rows_streaming(chunks, medians, sample, features=RISK_FEATURES, n_clusters=3, n_components=2,
+                       batch_size=4096, n_epochs=1, random_state=42):
+    """
+    Row-level chain with one streaming pass per estimator:
+    StandardScaler.partial_fit, IncrementalPCA.partial_fit on scaled chunks,
+    then MiniBatchKMeans.partial_fit on shuffled, projected mini-batches.
+    The k-means centres start from a full KMeans fit on the row sample, so
+    the result does not depend on which schemes come first.
+    """
+    scaler = StandardScaler()
+    for chunk in prepared_chunks(chunks, medians, features):
+        scaler.partial_fit(chunk[features].to_numpy(dtype=float))
+
+    # Each batch is fitted one step late, so a short one (IncrementalPCA needs at
+    # least n_components rows per batch) is merged into the batch before it
+    pca = IncrementalPCA(n_components=len(features))
+    pending = None
+    for chunk in prepared_chunks(chunks, medians, features):
+        scaled = scaler.transform(chunk[features].to_numpy(dtype=float))
+        if pending is None or len(pending) < len(features) or len(scaled) < len(features):
+            pending = scaled if pending is None else np.vstack([pending, scaled])
+            continue
+        pca.partial_fit(pending)
+        pending = scaled
+    if pending is not None:
+        pca.partial_fit(pending)
+    pca = as_pca(truncate_pca(pca, n_components))
+
+    def project(frame):
+        return pca.transform(scaler.transform(frame[features].to_numpy(dtype=float)))
+
+    sample = sample.fillna(medians.to_dict()).dropna(subset=list(features))
+    init = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10).fit(project(sample))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init.cluster_centers_, n_init=1,
+                             random_state=random_state, batch_size=batch_size)
+    rng = np.random.default_rng(random_state)
+    for _ in range(n_epochs):
+        for chunk in prepared_chunks(chunks, medians, features):
+            projected = project(chunk)[rng.permutation(len(chunk))]
+            for batch in minibatches(projected, batch_size):
+                if len(batch) >= n_clusters:
+                    kmeans.partial_fit(batch)
+    return scaler, pca, kmeans
+
+
+def aggregate_streaming(chunks, medians, features=RISK_FEATURES, level="scheme"):
+    """
+    Per-unit feature means, as risk_model.aggregate_features, from running
+    per-unit sums and counts.
+    """
+    sums, counts = None, None
+    for chunk in prepared_chunks(chunks, medians, features):
+        keys = cluster_keys(chunk, level)
+        grouped = pd.concat([keys, chunk[features]], axis=1).groupby(list(keys.columns))
+        part_sums, part_counts = grouped.sum(), grouped.size()
+        if sums is None:
+            sums, counts = part_sums, part_counts
+        else:
+            sums = sums.add(part_sums, fill_value=0)
+            counts = counts.add(part_counts, fill_value=0)
+    return sums.div(counts, axis=0).sort_index()
+
+
+def fit_streaming(chunks, features=RISK_FEATURES, level=DEFAULT_CLUSTER_LEVEL, n_clusters=3, n_components=2,
+                  random_state=42):
+    """
+    Fits the scaler, PCA and k-means without loading the table.
+    Returns (scaler, pca, kmeans, medians, unit_labels); unit_labels is a
+    Series of per-unit labels for aggregated levels and None for "row".
+    """
+    if level not in CLUSTER_LEVELS:
+        raise ValueError(f"❌ Unknown cluster level '{level}', expected one of {CLUSTER_LEVELS}")
+    sample = sample_rows(chunks, random_state=random_state)
+    medians = sample[FILL_MEDIAN_COLUMNS].median()
+    if level == "row":
+        scaler, pca, kmeans = fit_rows_streaming(chunks, medians, sample, features, n_clusters,
+                                                 n_components, random_state=random_state)
+        return scaler, pca, kmeans, medians, None
+
+    X = aggregate_streaming(chunks, medians, features, level)
+    scaler, pca, kmeans, _, labels = fit_risk_clusters(X, n_clusters, n_components,
+                                                       random_state=random_state)
+    return scaler, pca, kmeans, medians, pd.Series(labels, index=X.index)
+
+
+def write_labels(chunks, medians, scaler, pca, kmeans, path, features=RISK_FEATURES, level="row",
+                 unit_labels=None):
+    """
+    Streams SchemeID, Date, Cluster_Label and Risk_Level for every kept row
+    to `path`. Returns the k-means inertia of the row-level fit (None for
+    aggregated levels, where the clusterer's own inertia_ applies).
+    """
+    inertia = 0.0 if level == "row" else None
+    header = True
+    for chunk in prepared_chunks(chunks, medians, features):
+        if level == "row":
+            projected = pca.transform(scaler.transform(chunk[features].to_numpy(dtype=float)))
+            labels = kmeans.predict(projected)
+            inertia -= kmeans.score(projected)
+        else:
+            keys = cluster_keys(chunk, level)
+            index = keys.iloc[:, 0] if keys.shape[1] == 1 else pd.MultiIndex.from_frame(keys)
+            labels = unit_labels.to_numpy()[unit_labels.index.get_indexer(index)]
+        out = pd.DataFrame({"SchemeID": chunk["SchemeID"], "Date": chunk["Date"], "Cluster_Label": labels})
+        out["Risk_Level"] = out["Cluster_Label"].map(RISK_MAP)
+        out.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+    return inertia
+
+
+def save_artifacts(scaler, pca, kmeans, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, model in (("scaler", scaler), ("pca", pca), ("kmeans", kmeans)):
+        path = os.path.join(out_dir, ARTIFACT_NAMES[name])
+        joblib.dump(model, path)
+        print(f"✅ {type(model).__name__} saved as {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the risk clustering out of core.")
+    parser.add_argument("input", help="AFTER_PHASE_3(transformation) file")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--level", choices=CLUSTER_LEVELS, default=DEFAULT_CLUSTER_LEVEL,
+                        help="Clustering unit; the default matches phase 4-5")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--labels", help="CSV for the row labels (default: cluster_labels_streaming.csv in --out-dir)")
+    args = parser.parse_args()
+
+    chunks = chunk_source(args.input, chunksize=args.chunksize)
+    scaler, pca, kmeans, medians, unit_labels = fit_streaming(chunks, level=args.level)
+    save_artifacts(scaler, pca, kmeans, args.out_dir)
+
+    labels_path = args.labels or os.path.join(args.out_dir, "cluster_labels_streaming.csv")
+    inertia = write_labels(chunks, medians, scaler, pca, kmeans, labels_path, level=args.level,
+                           unit_labels=unit_labels)
+    print(f"✅Final KMeans Inertia: {inertia if inertia is not None else kmeans.inertia_:.2f}")
+    print(f"✅ Row labels saved to: {labels_path}")
+
+
+if __name__ == "__main__":
+    main()